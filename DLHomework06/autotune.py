@@ -0,0 +1,215 @@
+"""
+Probes the largest batch size that fits for YoloV1 and sweeps the
+DataLoader settings for the best images/s on this machine.
+
+The result is written to loader_config.json, which train.py picks up.
+
+    python autotune.py --files-dir ./train_data
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+
+import torch
+import torch.optim as optim
+from torch.utils.data import DataLoader
+
+from model import YoloV1
+from loss import YoloLoss
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "loader_config.json")
+
+DEFAULT_LOADER_CONFIG = {
+    "batch_size": 16,
+    "num_workers": 0,
+    "pin_memory": False,
+    "prefetch_factor": None,
+    "persistent_workers": False,
+}
+
+
+def load_loader_config(path=CONFIG_FILE, device=None):
+    """
+    Returns the tuned loader settings, falling back to the defaults.
+    Warns when they were tuned on a device other than `device`.
+    """
+    config = dict(DEFAULT_LOADER_CONFIG)
+    if os.path.exists(path):
+        with open(path, "r") as file:
+            config.update(json.load(file))
+    tuned_on = config.get("device")
+    if device is not None and tuned_on is not None and tuned_on != device:
+        print(f"=> Warning: {path} was tuned on {tuned_on}, running on {device}; rerun autotune.py")
+    return config
+
+
+def loader_kwargs(config, device):
+    """Turns a loader config into DataLoader keyword arguments; memory is only pinned for CUDA"""
+    kwargs = {
+        "batch_size": config["batch_size"],
+        "num_workers": config["num_workers"],
+        "pin_memory": config["pin_memory"] and device == "cuda",
+    }
+    # prefetch_factor and persistent_workers are only valid with worker processes
+    if config["num_workers"] > 0:
+        kwargs["persistent_workers"] = config["persistent_workers"]
+        if config["prefetch_factor"] is not None:
+            kwargs["prefetch_factor"] = config["prefetch_factor"]
+    return kwargs
+
+
+# On CPU an oversized batch usually gets the process killed by the kernel
+# (memory overcommit) instead of raising, so the probe stays well below that
+MAX_BATCH_SIZE = {"cuda": 256, "cpu": 32}
+
+
+def _is_oom(error):
+    """CUDA OOM, or a failed CPU allocation ("DefaultCPUAllocator: not enough memory")"""
+    cuda_oom = getattr(torch.cuda, "OutOfMemoryError", None)
+    if isinstance(error, MemoryError) or (cuda_oom is not None and isinstance(error, cuda_oom)):
+        return True
+    message = str(error).lower()
+    return "out of memory" in message or "not enough memory" in message
+
+
+def _try_batch_size(model, optimizer, loss_fn, batch_size, device, S=7, B=2, C=3):
+    """Runs one training step on a synthetic batch, returns False on OOM"""
+    try:
+        x = torch.randn(batch_size, 3, 448, 448, device=device)
+        y = torch.zeros(batch_size, S, S, C + 5 * B, device=device)
+        loss = loss_fn(model(x), y)
+        optimizer.zero_grad()
+        loss.backward()
+        optimizer.step()
+        return True
+    except (RuntimeError, MemoryError) as error:
+        if not _is_oom(error):
+            raise
+        return False
+    finally:
+        optimizer.zero_grad(set_to_none=True)
+        if device == "cuda":
+            torch.cuda.empty_cache()
+
+
+def probe_batch_size(device, max_batch_size=None, start=1):
+    """
+    Doubles the batch size until a training step runs out of memory,
+    then binary searches between the last size that fit and the first
+    that did not. max_batch_size defaults to MAX_BATCH_SIZE for the device.
+    """
+    if max_batch_size is None:
+        max_batch_size = MAX_BATCH_SIZE.get(device, MAX_BATCH_SIZE["cpu"])
+    model = YoloV1(split_size=7, num_boxes=2, num_classes=3).to(device)
+    optimizer = optim.Adam(model.parameters(), lr=2e-5)
+    loss_fn = YoloLoss()
+
+    if not _try_batch_size(model, optimizer, loss_fn, start, device):
+        raise RuntimeError(f"A batch of {start} does not fit on {device}")
+
+    good, bad = start, None
+    while good < max_batch_size:
+        candidate = min(good * 2, max_batch_size)
+        if _try_batch_size(model, optimizer, loss_fn, candidate, device):
+            good = candidate
+        else:
+            bad = candidate
+            break
+
+    while bad is not None and bad - good > 1:
+        mid = (good + bad) // 2
+        if _try_batch_size(model, optimizer, loss_fn, mid, device):
+            good = mid
+        else:
+            bad = mid
+
+    return good
+
+
+def measure_throughput(dataset, config, device, num_batches=20, warmup=2):
+    """Images/s for iterating the loader and copying batches to the device"""
+    loader = DataLoader(dataset=dataset, shuffle=True, drop_last=False, **loader_kwargs(config, device))
+    non_blocking = config["pin_memory"] and device == "cuda"
+
+    images, start = 0, None
+    for batch_idx, (x, y) in enumerate(loader):
+        if batch_idx == warmup:
+            if device == "cuda":
+                torch.cuda.synchronize()
+            start = time.perf_counter()
+        x = x.to(device, non_blocking=non_blocking)
+        y = y.to(device, non_blocking=non_blocking)
+        if start is not None:
+            images += x.shape[0]
+        if batch_idx + 1 >= warmup + num_batches:
+            break
+
+    if device == "cuda":
+        torch.cuda.synchronize()
+    if start is None or images == 0:
+        return 0.0
+    return images / (time.perf_counter() - start)
+
+
+def sweep_loader(dataset, batch_size, device, num_batches=20):
+    """Tries every worker/prefetch/pin_memory combination, returns the fastest"""
+    max_workers = os.cpu_count() or 1
+    worker_options = sorted({0, 1, 2, 4, 8, max_workers} & set(range(max_workers + 1)))
+    pin_options = [False, True] if device == "cuda" else [False]
+
+    results = []
+    for num_workers, pin_memory in itertools.product(worker_options, pin_options):
+        prefetch_options = [2, 4, 8] if num_workers > 0 else [None]
+        for prefetch_factor in prefetch_options:
+            config = {
+                "batch_size": batch_size,
+                "num_workers": num_workers,
+                "pin_memory": pin_memory,
+                "prefetch_factor": prefetch_factor,
+                "persistent_workers": num_workers > 0,
+            }
+            images_per_sec = measure_throughput(dataset, config, device, num_batches=num_batches)
+            print(f"workers={num_workers} pin_memory={pin_memory} prefetch={prefetch_factor}: "
+                  f"{images_per_sec:.1f} images/s")
+            results.append((images_per_sec, config))
+
+    best_rate, best_config = max(results, key=lambda result: result[0])
+    return best_config, best_rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune batch size and DataLoader settings for YoloV1")
+    parser.add_argument("--files-dir", default="./train_data")
+    parser.add_argument("--output", default=CONFIG_FILE)
+    parser.add_argument("--max-batch-size", type=int, default=None,
+                        help=f"largest batch size to probe (default {MAX_BATCH_SIZE['cuda']} on CUDA, "
+                             f"{MAX_BATCH_SIZE['cpu']} on CPU)")
+    parser.add_argument("--batch-size", type=int, default=None, help="skip the probe and use this batch size")
+    parser.add_argument("--num-batches", type=int, default=20, help="batches timed per loader setting")
+    args = parser.parse_args()
+
+    from train import Compose, DEVICE
+    import torchvision.transforms as transforms
+    from dataset import FruitImagesDataset
+
+    batch_size = args.batch_size
+    if batch_size is None:
+        batch_size = probe_batch_size(DEVICE, max_batch_size=args.max_batch_size)
+    print(f"Batch size: {batch_size}")
+
+    transform = Compose([transforms.Resize((448, 448)), transforms.ToTensor(),])
+    dataset = FruitImagesDataset(files_dir=args.files_dir, transform=transform)
+    config, images_per_sec = sweep_loader(dataset, batch_size, DEVICE, num_batches=args.num_batches)
+    config["images_per_sec"] = round(images_per_sec, 1)
+    config["device"] = DEVICE
+
+    with open(args.output, "w") as file:
+        json.dump(config, file, indent=2)
+    print(f"=> Saved loader config to {args.output}: {config}")
+
+
+if __name__ == "__main__":
+    main()
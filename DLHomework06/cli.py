@@ -0,0 +1,128 @@
+"""
+Command-line entry points for the YoloV1 fruit detector.
+
+    python cli.py train --files-dir ./train_data --checkpoint model.pth --epochs 1
+    python cli.py evaluate --files-dir ./test_data --threshold 0.4 --iou-threshold 0.5
+    python cli.py predict image1.jpg image2.jpg --plot
+    python cli.py sweep --thresholds 0.2 0.4 --iou-thresholds 0.3 0.5
+
+Each command imports only what it uses; matplotlib is loaded only by
+predict --plot. Check the startup cost with
+    python -X importtime cli.py predict image.jpg 2> importtime.log
+"""
+
+import argparse
+
+CLASS_NAMES = ["apple", "banana", "orange"]
+
+
+def _device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _load_model(checkpoint, device):
+    import torch
+    from model import YoloV1
+
+    model = YoloV1(split_size=7, num_boxes=2, num_classes=3).to(device)
+    model.load_state_dict(torch.load(checkpoint, map_location=device)["state_dict"])
+    model.eval()
+    return model
+
+
+def train_command(args):
+    from train import main as train_main
+    train_main(files_dir=args.files_dir, checkpoint=args.checkpoint, epochs=args.epochs)
+
+
+def evaluate_command(args):
+    import torchvision.transforms as transforms
+    from torch.utils.data import DataLoader
+    from autotune import load_loader_config, loader_kwargs
+    from dataset import FruitImagesDataset
+    from hw_utils import mean_average_precision
+    from train import Compose
+    from utils import get_bboxes
+
+    device = _device()
+    model = _load_model(args.checkpoint, device)
+    transform = Compose([transforms.Resize((448, 448)), transforms.ToTensor(),])
+    dataset = FruitImagesDataset(files_dir=args.files_dir, transform=transform)
+    loader_config = load_loader_config(device=device)
+    loader = DataLoader(dataset=dataset, shuffle=False, drop_last=False, **loader_kwargs(loader_config, device))
+    pred_boxes, target_boxes = get_bboxes(loader, model, iou_threshold=args.iou_threshold, threshold=args.threshold,
+                                          device=device)
+    mean_avg_prec = mean_average_precision(pred_boxes, target_boxes, iou_threshold=0.5, box_format="midpoint")
+    print(f"Test mAP: {mean_avg_prec}")
+
+
+def predict_command(args):
+    import torch
+    import torchvision.transforms as transforms
+    from PIL import Image
+    from hw_utils import non_max_suppression
+    from utils import cellboxes_to_boxes
+
+    device = _device()
+    model = _load_model(args.checkpoint, device)
+    transform = transforms.Compose([transforms.Resize((448, 448)), transforms.ToTensor(),])
+    for path in args.images:
+        image = Image.open(path).convert("RGB")
+        with torch.no_grad():
+            predictions = model(transform(image).unsqueeze(0).to(device))
+        boxes = non_max_suppression(cellboxes_to_boxes(predictions)[0], iou_threshold=args.iou_threshold,
+                                    threshold=args.threshold, box_format="midpoint")
+        print(f"{path}: {len(boxes)} boxes")
+        for klass, confidence, x, y, width, height in boxes:
+            print(f"  {CLASS_NAMES[int(klass)]} {confidence:.3f} x={x:.3f} y={y:.3f} w={width:.3f} h={height:.3f}")
+        if args.plot:
+            from utils import plot_image
+            plot_image(image, boxes)
+
+
+def sweep_command(args, rest):
+    from sweep import main as sweep_main
+    sweep_main(rest)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and run the YoloV1 fruit detector")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train = commands.add_parser("train", help="train from a checkpoint")
+    train.add_argument("--files-dir", default="./train_data")
+    train.add_argument("--checkpoint", default="model.pth")
+    train.add_argument("--epochs", type=int, default=1)
+    train.set_defaults(func=train_command)
+
+    evaluate = commands.add_parser("evaluate", help="mAP of a checkpoint on a dataset")
+    evaluate.add_argument("--files-dir", default="./train_data")
+    evaluate.add_argument("--checkpoint", default="model.pth")
+    evaluate.add_argument("--threshold", type=float, default=0.4)
+    evaluate.add_argument("--iou-threshold", type=float, default=0.5)
+    evaluate.set_defaults(func=evaluate_command)
+
+    predict = commands.add_parser("predict", help="detect fruit in images")
+    predict.add_argument("images", nargs="+")
+    predict.add_argument("--checkpoint", default="model.pth")
+    predict.add_argument("--threshold", type=float, default=0.4)
+    predict.add_argument("--iou-threshold", type=float, default=0.5)
+    predict.add_argument("--plot", action="store_true", help="show the boxes with matplotlib")
+    predict.set_defaults(func=predict_command)
+
+    sweep = commands.add_parser("sweep", help="threshold sweep on cached predictions (see sweep.py)", add_help=False)
+    sweep.set_defaults(func=sweep_command)
+
+    # sweep hands every remaining argument to its own parser
+    args, rest = parser.parse_known_args(argv)
+    if args.command == "sweep":
+        args.func(args, rest)
+    elif rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    else:
+        args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Threshold / NMS IoU sweep on cached raw predictions.
+
+The model is run once over the dataset and its raw (N, S*S, C+5B) outputs
+and the encoded (N, S, S, C+5B) targets are saved as .npy files under
+prediction_cache/<checkpoint hash>/. Every later sweep memory-maps them,
+so only NMS and the metrics are recomputed per setting, on a process
+pool. For each (threshold, iou_threshold) pair the boxes are built
+exactly as get_bboxes builds them, and the table has the mAP and the
+precision and recall of the boxes that survive NMS.
+
+    python sweep.py --checkpoint model.pth --files-dir ./train_data \
+        --thresholds 0.2 0.3 0.4 0.5 --iou-thresholds 0.3 0.5 0.7
+"""
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+
+from hw_utils import intersection_over_union, non_max_suppression, mean_average_precision
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prediction_cache")
+FIELDS = ["threshold", "iou_threshold", "mAP", "precision", "recall", "detections", "objects"]
+
+
+def checkpoint_hash(path, chunk_size=1 << 20):
+    """SHA-256 of the checkpoint file, shortened to 16 hex digits"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def cache_predictions(loader, model, entry_dir, device="cpu", meta=None):
+    """
+    Runs the model once over loader (which must not shuffle) and writes
+    predictions.npy, targets.npy and meta.json to entry_dir. The files are
+    written to a temporary directory first and moved into place at the end.
+    """
+    num_images = len(loader.dataset)
+    os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry_dir))
+    try:
+        predictions = targets = None
+        model.eval()
+        start = 0
+        with torch.no_grad():
+            for x, labels in loader:
+                out = model(x.to(device)).to("cpu")
+                stop = start + x.shape[0]
+                if predictions is None:
+                    S = labels.shape[1]
+                    predictions = np.lib.format.open_memmap(
+                        os.path.join(tmp_dir, "predictions.npy"), mode="w+", dtype=np.float32,
+                        shape=(num_images, S * S, labels.shape[-1]))
+                    targets = np.lib.format.open_memmap(
+                        os.path.join(tmp_dir, "targets.npy"), mode="w+", dtype=np.float32,
+                        shape=(num_images,) + tuple(labels.shape[1:]))
+                predictions[start:stop] = out.reshape(x.shape[0], S * S, -1).numpy()
+                targets[start:stop] = labels.numpy()
+                start = stop
+        predictions.flush()
+        targets.flush()
+        del predictions, targets
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as file:
+            json.dump(dict(meta or {}, num_images=num_images), file, indent=2)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(entry_dir)
+        os.replace(tmp_dir, entry_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return entry_dir
+
+
+def load_cached_predictions(entry_dir):
+    """Memory-mapped predictions and targets of a cache entry"""
+    predictions = np.load(os.path.join(entry_dir, "predictions.npy"), mmap_mode="r")
+    targets = np.load(os.path.join(entry_dir, "targets.npy"), mmap_mode="r")
+    return predictions, targets
+
+
+def cached_meta(entry_dir):
+    path = os.path.join(entry_dir, "meta.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as file:
+        return json.load(file)
+
+
+def precision_recall(pred_boxes, true_boxes, iou_threshold=0.5, box_format="midpoint"):
+    """
+    Precision and recall of the detections, matched greedily by confidence
+    to unmatched ground truths of the same image and class, as in
+    mean_average_precision.
+    """
+    unmatched = {}
+    for box in true_boxes:
+        unmatched.setdefault((box[0], box[1]), []).append(box)
+    true_positives = 0
+    for detection in sorted(pred_boxes, key=lambda box: box[2], reverse=True):
+        candidates = unmatched.get((detection[0], detection[1]), [])
+        if not candidates:
+            continue
+        ious = intersection_over_union(torch.tensor(detection[3:]).unsqueeze(0),
+                                       torch.tensor([box[3:] for box in candidates]), box_format).flatten()
+        best = int(ious.argmax())
+        if ious[best] > iou_threshold:
+            true_positives += 1
+            candidates.pop(best)
+    precision = true_positives / len(pred_boxes) if pred_boxes else 0.0
+    recall = true_positives / len(true_boxes) if true_boxes else 0.0
+    return precision, recall
+
+
+# Per-worker box lists, set by _init_worker
+_boxes = None
+
+
+def _init_worker(entry_dir):
+    """Converts the cached cell outputs to box lists once per worker"""
+    global _boxes
+    from utils import convert_cellboxes
+
+    predictions, targets = load_cached_predictions(entry_dir)
+    num_images, cells = predictions.shape[0], predictions.shape[1]
+    pred = convert_cellboxes(torch.from_numpy(np.array(predictions))).reshape(num_images, cells, -1)
+    true = convert_cellboxes(torch.from_numpy(np.array(targets))).reshape(num_images, cells, -1)
+    _boxes = (pred.tolist(), true.tolist())
+
+
+def _evaluate(setting):
+    threshold, iou_threshold, map_iou_threshold, num_classes = setting
+    all_pred_boxes, all_true_boxes = [], []
+    # Same filtering as get_bboxes
+    for idx, (bboxes, true_bboxes) in enumerate(zip(*_boxes)):
+        for nms_box in non_max_suppression(bboxes, iou_threshold=iou_threshold, threshold=threshold,
+                                           box_format="midpoint"):
+            all_pred_boxes.append([idx] + nms_box)
+        for box in true_bboxes:
+            if box[1] > threshold:
+                all_true_boxes.append([idx] + box)
+
+    mean_avg_prec = 0.0
+    if all_true_boxes:
+        mean_avg_prec = float(mean_average_precision(all_pred_boxes, all_true_boxes, iou_threshold=map_iou_threshold,
+                                                     box_format="midpoint", num_classes=num_classes))
+    precision, recall = precision_recall(all_pred_boxes, all_true_boxes, map_iou_threshold)
+    return {
+        "threshold": threshold,
+        "iou_threshold": iou_threshold,
+        "mAP": mean_avg_prec,
+        "precision": precision,
+        "recall": recall,
+        "detections": len(all_pred_boxes),
+        "objects": len(all_true_boxes),
+    }
+
+
+def sweep(entry_dir, thresholds, iou_thresholds, map_iou_threshold=0.5, num_classes=3, workers=None):
+    """One result row per (threshold, iou_threshold) pair, computed on `workers` processes"""
+    settings = [(threshold, iou_threshold, map_iou_threshold, num_classes)
+                for threshold, iou_threshold in itertools.product(thresholds, iou_thresholds)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(entry_dir,)) as pool:
+        return list(pool.map(_evaluate, settings))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep confidence and NMS thresholds on cached YoloV1 outputs")
+    parser.add_argument("--checkpoint", default="model.pth")
+    parser.add_argument("--files-dir", default="./train_data")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.2, 0.3, 0.4, 0.5, 0.6])
+    parser.add_argument("--iou-thresholds", type=float, nargs="+", default=[0.3, 0.4, 0.5, 0.6, 0.7])
+    parser.add_argument("--map-iou", type=float, default=0.5, help="IoU for a detection to count as correct")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args(argv)
+
+    entry_dir = os.path.join(args.cache_dir, checkpoint_hash(args.checkpoint))
+    meta = {"files_dir": os.path.abspath(args.files_dir)}
+    cached = cached_meta(entry_dir)
+    if cached is None or cached.get("files_dir") != meta["files_dir"]:
+        from torch.utils.data import DataLoader
+        import torchvision.transforms as transforms
+        from autotune import load_loader_config, loader_kwargs
+        from dataset import FruitImagesDataset
+        from model import YoloV1
+        from train import Compose, DEVICE
+
+        model = YoloV1(split_size=7, num_boxes=2, num_classes=3).to(DEVICE)
+        model.load_state_dict(torch.load(args.checkpoint, map_location=DEVICE)["state_dict"])
+        transform = Compose([transforms.Resize((448, 448)), transforms.ToTensor(),])
+        dataset = FruitImagesDataset(files_dir=args.files_dir, transform=transform)
+        loader_config = load_loader_config(device=DEVICE)
+        loader = DataLoader(dataset=dataset, shuffle=False, drop_last=False, **loader_kwargs(loader_config, DEVICE))
+        print(f"=> Caching raw predictions in {entry_dir}")
+        cache_predictions(loader, model, entry_dir, device=DEVICE, meta=meta)
+    else:
+        print(f"=> Using cached predictions in {entry_dir}")
+
+    rows = sweep(entry_dir, args.thresholds, args.iou_thresholds, args.map_iou, workers=args.workers)
+    with open(args.output, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"{'threshold':>9} {'iou':>5} {'mAP':>7} {'precision':>9} {'recall':>7} {'boxes':>6}")
+    for row in rows:
+        print(f"{row['threshold']:>9.2f} {row['iou_threshold']:>5.2f} {row['mAP']:>7.4f} "
+              f"{row['precision']:>9.4f} {row['recall']:>7.4f} {row['detections']:>6}")
+    best = max(rows, key=lambda row: row["mAP"])
+    print(f"Best mAP {best['mAP']:.4f} at threshold={best['threshold']} iou_threshold={best['iou_threshold']}")
+
+
+if __name__ == "__main__":
+    main()
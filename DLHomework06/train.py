@@ -16,12 +16,12 @@ from utils import (
     intersection_over_union,
     cellboxes_to_boxes,
     get_bboxes,
-    plot_image,
     save_checkpoint,
     load_checkpoint,
 )
 from loss import YoloLoss
 from dataset import FruitImagesDataset
+from autotune import load_loader_config, loader_kwargs
 
 seed = 123
 torch.manual_seed(seed)
@@ -29,7 +29,8 @@ torch.manual_seed(seed)
 
 LEARNING_RATE = 2e-5
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
-BATCH_SIZE = 16 # 64 in original paper but resource exhausted error otherwise.
+LOADER_CONFIG = load_loader_config(device=DEVICE) # written by autotune.py, defaults otherwise
+PIN_MEMORY = LOADER_CONFIG["pin_memory"] and DEVICE == "cuda"
 WEIGHT_DECAY = 0
 EPOCHS = 1
 LOAD_MODEL_FILE = "model.pth"
@@ -52,7 +53,7 @@ def train_fn(train_loader, model, optimizer, loss_fn):
     mean_loss = []
 
     for batch_idx, (x, y) in enumerate(loop):
-        x, y = x.to(DEVICE), y.to(DEVICE)
+        x, y = x.to(DEVICE, non_blocking=PIN_MEMORY), y.to(DEVICE, non_blocking=PIN_MEMORY)
         out = model(x)
         loss = loss_fn(out, y)
         mean_loss.append(loss.item())
@@ -66,7 +67,7 @@ def train_fn(train_loader, model, optimizer, loss_fn):
     print(f"Mean loss was {sum(mean_loss)/len(mean_loss)}")
 
         
-def main():
+def main(files_dir=FILES_DIR, checkpoint=LOAD_MODEL_FILE, epochs=EPOCHS):
 
     model = YoloV1(split_size=7, num_boxes=2, num_classes=3).to(DEVICE)
     optimizer = optim.Adam(
@@ -75,18 +76,18 @@ def main():
     loss_fn = YoloLoss()
     transform = Compose([transforms.Resize((448, 448)), transforms.ToTensor(),])
 
-    load_checkpoint(torch.load(LOAD_MODEL_FILE, map_location=DEVICE), model, optimizer)
+    load_checkpoint(torch.load(checkpoint, map_location=DEVICE), model, optimizer)
 
-    test_dataset = FruitImagesDataset(files_dir=FILES_DIR, transform=transform)
+    test_dataset = FruitImagesDataset(files_dir=files_dir, transform=transform)
 
     test_loader = DataLoader(
         dataset=test_dataset,
-        batch_size=BATCH_SIZE,
         shuffle=True,
         drop_last=False,
+        **loader_kwargs(LOADER_CONFIG, DEVICE),
     )
         
-    for epoch in range(EPOCHS):
+    for epoch in range(epochs):
         model.eval()
         train_fn(test_loader, model, optimizer, loss_fn)
         
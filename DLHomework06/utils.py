@@ -1,13 +1,15 @@
 import torch
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
 from collections import Counter
 from hw_utils import intersection_over_union, non_max_suppression, mean_average_precision
 
 
 def plot_image(image, boxes):
     """Plots predicted bounding boxes on the image"""
+    # matplotlib is only imported when something is actually plotted
+    import matplotlib.pyplot as plt
+    import matplotlib.patches as patches
+
     im = np.array(image)
     height, width, _ = im.shape
 
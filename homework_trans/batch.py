@@ -0,0 +1,153 @@
+"""
+Batched simulated annealing on a GiantTour.
+
+Instead of proposing and scoring one move at a time, every batch samples
+`batch_size` candidate moves (swap and relocate, within or between
+routes) and scores all their deltas with NumPy fancy indexing into the
+distance matrix, through the succ/pred arrays of the tour.
+
+Acceptance semantics
+--------------------
+All candidates of a batch are scored against the solution as it was at
+the start of the batch. The Metropolis test (delta < 0, or
+exp(-delta / T) > u with u ~ U[0, 1)) is drawn for every candidate at
+once. The candidates that pass it are then applied one by one in the
+order they were sampled. A candidate is skipped, and counts as rejected,
+if it touches a node (the moved customers or their route neighbours)
+that an earlier move of the same batch already changed, or if it no
+longer fits the vehicle capacity after the earlier moves. The delta of a
+move depends only on the links of the nodes it touches, so every move
+that is applied has exactly the delta it was scored with. The result is
+a sequential Metropolis chain over the non-conflicting moves of each
+batch.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from workM import solution_cost
+
+SWAP, RELOCATE = 0, 1
+
+
+def score_moves(tour, distance_matrix, capacity, kinds, a, b):
+    """Deltas and feasibility of the candidate moves (kind, a, b), all as arrays"""
+    dm = distance_matrix
+    pred, succ = tour.pred, tour.succ
+    pa, sa, pb, sb = pred[a], succ[a], pred[b], succ[b]
+    route_a, route_b = tour.route_of[a], tour.route_of[b]
+    demand_a, demand_b = tour.node_demand[a], tour.node_demand[b]
+    other_route = route_a != route_b
+
+    # Swap a and b; adjacent pairs share an edge and need their own formula
+    swap_delta = (dm[pa, b] + dm[b, sa] + dm[pb, a] + dm[a, sb]
+                  - dm[pa, a] - dm[a, sa] - dm[pb, b] - dm[b, sb])
+    a_before_b = sa == b
+    b_before_a = sb == a
+    swap_delta = np.where(a_before_b, dm[pa, b] + dm[b, a] + dm[a, sb] - dm[pa, a] - dm[a, b] - dm[b, sb], swap_delta)
+    swap_delta = np.where(b_before_a, dm[pb, a] + dm[a, b] + dm[b, sa] - dm[pb, b] - dm[b, a] - dm[a, sa], swap_delta)
+    swap_ok = ~other_route | (
+        (tour.loads[route_a] - demand_a + demand_b <= capacity) & (tour.loads[route_b] - demand_b + demand_a <= capacity)
+    )
+
+    # Relocate a to just after b
+    relocate_delta = (dm[pa, sa] - dm[pa, a] - dm[a, sa]
+                      + dm[b, a] + dm[a, sb] - dm[b, sb])
+    relocate_ok = (b != pa) & (~other_route | (tour.loads[route_b] + demand_a <= capacity))
+
+    is_swap = kinds == SWAP
+    delta = np.where(is_swap, swap_delta, relocate_delta)
+    feasible = (a != b) & np.where(is_swap, swap_ok, relocate_ok)
+    return delta, feasible
+
+
+def anneal_batched(tour, distance_matrix, capacity, temp_initial, temp_final, cooling_rate, max_iterations,
+                   batch_size=256, rng=None, neighbors=None, stats=None):
+    """
+    Annealing with batched proposals. tour (a GiantTour built with demands)
+    is modified in place. Returns the best solution in list form and its cost.
+    stats (instrumentation.SolverStats) gets one record per temperature step.
+    """
+    search_start = time.perf_counter()
+    rng = rng if rng is not None else np.random.default_rng()
+    customers = tour.tour.copy()
+    depot = tour.depot
+    current_cost = tour.total_cost(distance_matrix)
+    best_solution, best_cost = None, current_cost
+    current_is_best = True
+    if len(customers) < 2:
+        return tour.to_routes(), current_cost
+
+    touched = [-1] * tour.num_nodes  # batch in which each node was last changed
+    batches_per_step = max(1, math.ceil(max_iterations / batch_size))
+    batch_id = 0
+    temp = temp_initial
+
+    while temp > temp_final:
+        proposals, accepts, improvements = [0, 0], [0, 0], [0, 0]
+        for _ in range(batches_per_step):
+            batch_id += 1
+            kinds = rng.integers(0, 2, batch_size)
+            if stats is not None:
+                proposals[1] += int(kinds.sum())
+            a = customers[rng.integers(0, len(customers), batch_size)]
+            if neighbors is not None:
+                b = neighbors[a, rng.integers(0, neighbors.shape[1], batch_size)]
+            else:
+                b = customers[rng.integers(0, len(customers), batch_size)]
+
+            delta, feasible = score_moves(tour, distance_matrix, capacity, kinds, a, b)
+            with np.errstate(over="ignore"):
+                passes = feasible & ((delta < 0) | (np.exp(-delta / temp) > rng.random(batch_size)))
+            candidates = np.flatnonzero(passes)
+            if len(candidates) == 0:
+                continue
+
+            # Neighbourhoods as of the start of the batch, for the conflict check
+            pa, sa = tour.pred[a[candidates]], tour.succ[a[candidates]]
+            pb, sb = tour.pred[b[candidates]], tour.succ[b[candidates]]
+            for kind, node_a, node_b, move_delta, nodes in zip(
+                    kinds[candidates].tolist(), a[candidates].tolist(), b[candidates].tolist(),
+                    delta[candidates].tolist(), zip(pa.tolist(), sa.tolist(), pb.tolist(), sb.tolist())):
+                involved = (node_a, node_b) + nodes
+                if any(touched[node] == batch_id for node in involved if node != depot):
+                    continue
+                route_a, route_b = tour.route_of[node_a], tour.route_of[node_b]
+                if route_a != route_b:
+                    demand_a, demand_b = tour.node_demand[node_a], tour.node_demand[node_b]
+                    if kind == SWAP:
+                        if (tour.loads[route_a] - demand_a + demand_b > capacity
+                                or tour.loads[route_b] - demand_b + demand_a > capacity):
+                            continue
+                    elif tour.loads[route_b] + demand_a > capacity:
+                        continue
+
+                new_cost = current_cost + move_delta
+                if current_is_best and not new_cost < best_cost:
+                    best_solution = tour.to_routes()
+                    current_is_best = False
+                if kind == SWAP:
+                    tour.swap(node_a, node_b)
+                else:
+                    tour.insert_after(node_a, node_b)
+                for node in involved:
+                    touched[node] = batch_id
+                accepts[kind] += 1
+                if move_delta < 0:
+                    improvements[kind] += 1
+                current_cost = new_cost
+                if new_cost < best_cost:
+                    best_cost = new_cost
+                    current_is_best = True
+        if stats is not None:
+            proposals[0] = batches_per_step * batch_size - proposals[1]
+            stats.record_step(temp, current_cost, best_cost, ("swap", "relocate"), proposals, accepts, improvements)
+        temp *= cooling_rate
+
+    if current_is_best:
+        best_solution = tour.to_routes()
+    if stats is not None:
+        stats.add_time("search", time.perf_counter() - search_start)
+    return best_solution, solution_cost(best_solution, distance_matrix)
@@ -0,0 +1,207 @@
+"""
+Parallel, resumable benchmark over the A/M/P CVRP instance sets.
+
+Every (instance, seed) pair runs in its own worker process with a time
+limit. Results are appended to a CSV file as soon as they arrive, so an
+interrupted sweep picks up where it stopped: pairs already recorded as
+"ok" are skipped on the next run. The plots are written to files with a
+non-interactive backend instead of being shown.
+
+    python benchmark.py ROOT --seeds 0 1 2 --workers 8 --timeout 600
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import multiprocessing
+import os
+import queue
+import random
+import time
+
+from workM import run_app
+
+FOLDERS = ["A", "M", "P"]
+FIELDS = ["instance", "problem_type", "seed", "status", "num_nodes", "solution_quality", "solve_time"]
+
+
+def find_instances(root_folder, folders=FOLDERS):
+    """(problem type, .vrp path, .sol path) for every instance with a reference solution"""
+    instances = []
+    for folder in folders:
+        folder_path = os.path.join(root_folder, folder)
+        if not os.path.exists(folder_path):
+            continue
+        for file_name in sorted(os.listdir(folder_path)):
+            if file_name.endswith(".vrp"):
+                vrp_file = os.path.join(folder_path, file_name)
+                sol_file = vrp_file[:-len(".vrp")] + ".sol"
+                if os.path.exists(sol_file):
+                    instances.append((folder, vrp_file, sol_file))
+    return instances
+
+
+def load_done(results_path):
+    """Keys of the (instance, seed) pairs that already finished successfully"""
+    done = set()
+    if os.path.exists(results_path):
+        with open(results_path, "r", newline="") as file:
+            for row in csv.DictReader(file):
+                if row["status"] == "ok":
+                    done.add((row["instance"], int(row["seed"])))
+    return done
+
+
+def _solve(task, results, solver_options):
+    problem_type, vrp_file, sol_file, seed = task
+    random.seed(seed)
+    try:
+        # run_app prints every route; keep worker output quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            solution_quality, solve_time, num_nodes = run_app(vrp_file, sol_file, **solver_options)
+        results.put((task, "ok", num_nodes, solution_quality, solve_time))
+    except Exception as error:
+        results.put((task, f"error: {error!r}", "", "", ""))
+
+
+def run_benchmark(root_folder, results_path, seeds=(0,), workers=None, timeout=None, solver_options=None):
+    """
+    Solves every pending (instance, seed) pair on `workers` processes and
+    appends one CSV row per pair to results_path. Returns the number of
+    pairs run in this call.
+    """
+    workers = workers or os.cpu_count() or 1
+    solver_options = solver_options or {}
+    done = load_done(results_path)
+    pending = [
+        (problem_type, vrp_file, sol_file, seed)
+        for problem_type, vrp_file, sol_file in find_instances(root_folder)
+        for seed in seeds
+        if (os.path.basename(vrp_file), seed) not in done
+    ]
+    num_pending = len(pending)
+    print(f"{num_pending} runs pending, {len(done)} already done")
+
+    new_file = not os.path.exists(results_path) or os.path.getsize(results_path) == 0
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    running = {}  # task -> (process, start time)
+
+    with open(results_path, "a", newline="") as file:
+        writer = csv.writer(file)
+        if new_file:
+            writer.writerow(FIELDS)
+            file.flush()
+
+        def record(task, status, num_nodes, solution_quality, solve_time):
+            problem_type, vrp_file, _, seed = task
+            writer.writerow([os.path.basename(vrp_file), problem_type, seed, status,
+                             num_nodes, solution_quality, solve_time])
+            file.flush()
+            print(f"{os.path.basename(vrp_file)} seed={seed}: {status}")
+
+        while pending or running:
+            while pending and len(running) < workers:
+                task = pending.pop(0)
+                process = context.Process(target=_solve, args=(task, results, solver_options), daemon=True)
+                process.start()
+                running[task] = (process, time.time())
+
+            # Drain every queued result before the timeout check, so a run that
+            # has already reported is never terminated and recorded twice
+            finished = []
+            try:
+                finished.append(results.get(timeout=0.2))
+                while True:
+                    finished.append(results.get_nowait())
+            except queue.Empty:
+                pass
+            for task, *row in finished:
+                if task not in running:
+                    continue  # already recorded as a timeout or crash
+                process, _ = running.pop(task)
+                process.join()
+                record(task, *row)
+
+            now = time.time()
+            for task, (process, started) in list(running.items()):
+                if timeout is not None and now - started > timeout:
+                    process.terminate()
+                    process.join()
+                    running.pop(task)
+                    record(task, "timeout", "", "", now - started)
+                elif not process.is_alive() and process.exitcode not in (0, None):
+                    running.pop(task)
+                    record(task, f"crashed: exit code {process.exitcode}", "", "", now - started)
+
+    return num_pending
+
+
+def analyze_vrp_results(results_path, output_dir):
+    """Correlation, scatter and box plots of the successful runs, saved as PNG files"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
+    df = pd.read_csv(results_path)
+    df = df[df["status"] == "ok"].rename(columns={
+        "problem_type": "Problem Type",
+        "num_nodes": "Num Nodes",
+        "solution_quality": "Solution Quality",
+        "solve_time": "Solve Time",
+    })
+    df[["Num Nodes", "Solution Quality", "Solve Time"]] = df[["Num Nodes", "Solution Quality", "Solve Time"]].astype(float)
+    os.makedirs(output_dir, exist_ok=True)
+
+    corr_matrix = df[["Num Nodes", "Solution Quality", "Solve Time"]].corr()
+
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(corr_matrix, annot=True, cmap="coolwarm", fmt=".2f")
+    plt.title("Correlation heatmap")
+    plt.savefig(os.path.join(output_dir, "correlation.png"))
+    plt.close()
+
+    plt.figure(figsize=(8, 6))
+    sns.scatterplot(data=df, x="Num Nodes", y="Solve Time", hue="Problem Type", style="Problem Type")
+    plt.xlabel("Problem scale (number of nodes)")
+    plt.ylabel("Calculation time")
+    plt.title("Problem dimension vs calculation time")
+    plt.savefig(os.path.join(output_dir, "dimension_time.png"))
+    plt.close()
+
+    plt.figure(figsize=(8, 6))
+    sns.boxplot(data=df, x="Problem Type", y="Solve Time")
+    plt.xlabel("question type")
+    plt.ylabel("Calculation time")
+    plt.title("Distribution of computation time for different types of problems")
+    plt.savefig(os.path.join(output_dir, "time_types.png"))
+    plt.close()
+
+    for problem_type, deviation in df.groupby("Problem Type")["Solution Quality"].mean().items():
+        print(f"{problem_type} mean deviation: {deviation:.2f}")
+    print(f"Overall mean deviation: {df['Solution Quality'].mean():.2f}")
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CVRP solver over the A/M/P instance sets")
+    parser.add_argument("root_folder", help="folder containing A/, M/ and P/")
+    parser.add_argument("--results", default="benchmark_results.csv")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=None, help="seconds per run")
+    parser.add_argument("--plots", default="benchmark_plots", help="folder for the PNG plots")
+    parser.add_argument("--parquet", default=None, help="also export the results to this Parquet file")
+    args = parser.parse_args(argv)
+
+    run_benchmark(args.root_folder, args.results, seeds=args.seeds, workers=args.workers, timeout=args.timeout)
+    df = analyze_vrp_results(args.results, args.plots)
+    if args.parquet:
+        df.to_parquet(args.parquet)
+
+
+if __name__ == "__main__":
+    main()
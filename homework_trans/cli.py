@@ -0,0 +1,85 @@
+"""
+Command-line entry points for the CVRP solver.
+
+    python cli.py solve A/A-n32-k5.vrp --time-limit 10 --output A-n32-k5.best.sol
+    python cli.py benchmark ROOT --seeds 0 1 2 --workers 8 --timeout 600
+
+solve compares against the .sol next to the instance if there is one.
+Only the benchmark plots import pandas, seaborn and matplotlib; solving
+needs nothing beyond NumPy, which keeps short-lived worker processes
+quick to start. Check with
+    python -X importtime cli.py solve A/A-n32-k5.vrp 2> importtime.log
+"""
+
+import argparse
+import os
+import random
+
+
+def solve_command(args):
+    from workM import run_app
+    from operators import DEFAULT_OPERATORS
+
+    random.seed(args.seed)
+    reference = args.reference
+    if reference is None and os.path.exists(os.path.splitext(args.instance)[0] + ".sol"):
+        reference = os.path.splitext(args.instance)[0] + ".sol"
+    operators = None
+    if args.operators is not None:
+        operators = args.operators or DEFAULT_OPERATORS
+    run_app(args.instance, reference, cache_dir=args.cache_dir, operators=operators, granularity=args.granularity,
+            time_limit=args.time_limit, stats_path=args.stats, decomposition=args.decomposition,
+            initial_solution_path=args.warm_start, warm_temperature=args.warm_temperature,
+            solution_output=args.output, polish_interval=args.polish_interval, batch_size=args.batch_size,
+            chains=args.chains, mode=args.mode, repair=args.repair)
+
+
+def benchmark_command(args, rest):
+    from benchmark import main as benchmark_main
+    benchmark_main(rest)
+
+
+def main(argv=None):
+    from operators import OPERATORS
+    from parallel import MODES
+
+    parser = argparse.ArgumentParser(description="CVRP simulated annealing solver")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    solve = commands.add_parser("solve", help="solve one instance (the file name must contain kN, the vehicle count)")
+    solve.add_argument("instance", help=".vrp file")
+    solve.add_argument("--reference", default=None, help=".sol file to compare with (default: next to the instance)")
+    solve.add_argument("--seed", type=int, default=None)
+    solve.add_argument("--time-limit", type=float, default=None, help="seconds; derives the cooling schedule")
+    solve.add_argument("--operators", nargs="*", choices=sorted(OPERATORS), default=None,
+                       help="move operators; without names the default set")
+    solve.add_argument("--granularity", type=int, default=None, help="nearest neighbours per customer")
+    solve.add_argument("--polish-interval", type=int, default=None,
+                       help="polish routes every N temperature steps (needs --operators or --time-limit)")
+    solve.add_argument("--batch-size", type=int, default=None, help="score this many moves at once (batch.py)")
+    solve.add_argument("--chains", type=int, default=None, help="anneal this many chains in parallel")
+    solve.add_argument("--mode", choices=MODES, default="independent", help="how the parallel chains interact")
+    solve.add_argument("--decomposition", choices=["sweep", "kmeans"], default=None, help="for very large instances")
+    solve.add_argument("--warm-start", default=None, help=".sol file to continue from")
+    solve.add_argument("--warm-temperature", type=float, default=None)
+    solve.add_argument("--repair", action="store_true", help="make an infeasible --warm-start solution feasible")
+    solve.add_argument("--output", default=None, help="write the best solution to this .sol file")
+    solve.add_argument("--stats", default=None, help="write solver statistics to this JSON file")
+    solve.add_argument("--cache-dir", default=None, help="parsed-instance cache")
+    solve.set_defaults(func=solve_command)
+
+    benchmark = commands.add_parser("benchmark", help="batch benchmark (see benchmark.py)", add_help=False)
+    benchmark.set_defaults(func=benchmark_command)
+
+    # benchmark hands every remaining argument to its own parser
+    args, rest = parser.parse_known_args(argv)
+    if args.command == "benchmark":
+        args.func(args, rest)
+    elif rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    else:
+        args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Decomposition solver for very large instances (thousands of customers).
+
+No n x n distance matrix is built. The customers are split into clusters
+of about `cluster_size` customers, by angular sweep around the depot or
+by k-means on the coordinates. Every cluster is solved as a small CVRP of
+its own (Clarke-Wright + solver.solve, with a cluster-sized distance
+matrix) on a process pool, and the routes are put together. Border rounds
+then regroup whole routes by the angle of their centroid, shifted by half
+a group each round so every group straddles the previous borders, and
+re-anneal each group starting from its current routes. Route costs are
+computed on demand from the coordinates.
+
+Memory is O(n + workers * cluster_size^2) and the work per cluster is
+fixed, so time grows linearly with the number of customers.
+
+    instance = parse_vrp(path)
+    routes, cost = decompose_solve(instance["coords"], instance["demands"], instance["capacity"],
+                                   instance["depot"], method="kmeans", workers=8)
+"""
+
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from workM import build_distance_matrix
+from operators import DEFAULT_OPERATORS
+
+METHODS = ("sweep", "kmeans")
+
+
+def sweep_clusters(coords, depot, cluster_size):
+    """
+    Customers ordered by polar angle around the depot and cut into runs of
+    cluster_size. The sweep starts at the widest angular gap.
+    """
+    customers = np.array([node for node in range(len(coords)) if node != depot])
+    if len(customers) == 0:
+        return []
+    offset = coords[customers] - coords[depot]
+    angles = np.arctan2(offset[:, 1], offset[:, 0])
+    order = np.argsort(angles, kind="stable")
+    gaps = np.diff(np.append(angles[order], angles[order[0]] + 2 * math.pi))
+    order = np.roll(order, -(int(np.argmax(gaps)) + 1))
+    return [customers[order[start:start + cluster_size]] for start in range(0, len(order), cluster_size)]
+
+
+def kmeans_clusters(coords, depot, num_clusters, rng, iterations=20, chunk_size=4096):
+    """Lloyd's k-means on the customer coordinates; returns the non-empty clusters"""
+    customers = np.array([node for node in range(len(coords)) if node != depot])
+    points = coords[customers]
+    num_clusters = max(1, min(num_clusters, len(customers)))
+    centers = points[rng.choice(len(points), num_clusters, replace=False)]
+    labels = np.zeros(len(points), dtype=np.int64)
+    for _ in range(iterations):
+        # Assign a block of points at a time so the distance block stays small
+        for start in range(0, len(points), chunk_size):
+            block = points[start:start + chunk_size]
+            distances = ((block[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+            labels[start:start + chunk_size] = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=num_clusters)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, points)
+        empty = counts == 0
+        # Empty clusters are restarted on random customers
+        centers = np.where(empty[:, None], points[rng.choice(len(points), num_clusters)],
+                           sums / np.maximum(counts, 1)[:, None])
+    return [customers[labels == k] for k in range(num_clusters) if (labels == k).any()]
+
+
+def route_length(coords, route, rounding=False):
+    """Length of one route, from the coordinates"""
+    points = coords[route]
+    steps = np.sqrt(((points[1:] - points[:-1]) ** 2).sum(axis=1))
+    if rounding:
+        steps = np.floor(steps + 0.5)
+    return float(steps.sum())
+
+
+def solution_length(coords, routes, rounding=False):
+    return sum(route_length(coords, route, rounding) for route in routes)
+
+
+def _solve_cluster(task):
+    """Solves the CVRP on `nodes` (depot first) and returns its routes in global node ids"""
+    from solver import solve
+
+    nodes, coords, node_demand, capacity, initial_routes, evaluations, time_limit, operators, seed, rounding = task
+    distance_matrix = build_distance_matrix(coords, rounding=rounding)
+    demands = {local + 1: int(demand) for local, demand in enumerate(node_demand)}
+    max_vehicles = max(1, math.ceil(node_demand.sum() / capacity))
+    if initial_routes is not None:
+        local_of = {node: local for local, node in enumerate(nodes.tolist())}
+        initial_routes = [[local_of[node] for node in route] for route in initial_routes]
+    result = solve(0, list(range(1, len(nodes))), capacity, demands, distance_matrix, max_vehicles,
+                   time_limit=time_limit, max_evaluations=evaluations, operators=operators,
+                   rng=random.Random(seed), initial_routes=initial_routes)
+    return [nodes[route].tolist() for route in result["routes"]]
+
+
+def border_groups(coords, routes, depot, group_size, shift):
+    """
+    Consecutive routes by centroid angle around the depot, about group_size
+    customers per group. shift=True starts half a group later.
+    """
+    centroids = np.array([coords[route[1:-1]].mean(axis=0) for route in routes]) - coords[depot]
+    order = np.argsort(np.arctan2(centroids[:, 1], centroids[:, 0]), kind="stable").tolist()
+    if shift:
+        sizes = np.cumsum([len(routes[r]) - 2 for r in order])
+        first = int(np.searchsorted(sizes, group_size // 2))
+        order = order[first:] + order[:first]
+    groups, group, size = [], [], 0
+    for r in order:
+        group.append(r)
+        size += len(routes[r]) - 2
+        if size >= group_size:
+            groups.append(group)
+            group, size = [], 0
+    if group:
+        groups.append(group)
+    return groups
+
+
+def decompose_solve(coords, demands, capacity, depot=0, method="sweep", cluster_size=200, border_rounds=2,
+                    workers=None, evaluations_per_customer=1000, time_limit=None, operators=DEFAULT_OPERATORS,
+                    seed=0, rounding=False, total_time=None):
+    """
+    coords is the (n, 2) array and demands the per-node demand array of
+    parse_vrp. Every subproblem gets evaluations_per_customer annealing
+    moves per customer, or time_limit seconds if given. total_time instead
+    is a budget for the whole solve, shared out evenly over the clusters of
+    the first pass and the border rounds. Returns the routes (global node
+    ids) and their total length.
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+    if time_limit is not None and total_time is not None:
+        raise ValueError("give time_limit (per subproblem) or total_time, not both")
+    coords = np.asarray(coords, dtype=np.float64)
+    demands = np.asarray(demands)
+    rng = np.random.default_rng(seed)
+    if method == "sweep":
+        clusters = sweep_clusters(coords, depot, cluster_size)
+    else:
+        num_customers = len(coords) - 1
+        clusters = kmeans_clusters(coords, depot, math.ceil(num_customers / cluster_size), rng)
+    if total_time is not None:
+        # Every pass solves about len(clusters) subproblems, `workers` at a time
+        batches = math.ceil(len(clusters) / (workers or os.cpu_count() or 1))
+        time_limit = total_time / ((1 + border_rounds) * max(batches, 1))
+
+    def task(customers, initial_routes, k):
+        nodes = np.concatenate(([depot], customers))
+        node_demand = demands[nodes].copy()
+        node_demand[0] = 0
+        evaluations = None if time_limit is not None else evaluations_per_customer * len(customers)
+        return (nodes, coords[nodes], node_demand, capacity, initial_routes, evaluations, time_limit, operators,
+                int(rng.integers(2 ** 32)) + k, rounding)
+
+    with ProcessPoolExecutor(workers) as pool:
+        tasks = [task(customers, None, k) for k, customers in enumerate(clusters)]
+        routes = [route for cluster_routes in pool.map(_solve_cluster, tasks) for route in cluster_routes]
+
+        for round_idx in range(border_rounds):
+            groups = border_groups(coords, routes, depot, cluster_size, shift=round_idx % 2 == 0)
+            tasks = []
+            for k, group in enumerate(groups):
+                group_routes = [routes[r] for r in group]
+                customers = np.array([node for route in group_routes for node in route[1:-1]])
+                tasks.append(task(customers, group_routes, k))
+            routes = [route for group_routes in pool.map(_solve_cluster, tasks) for route in group_routes]
+
+    return routes, solution_length(coords, routes, rounding)
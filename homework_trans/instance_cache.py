@@ -0,0 +1,80 @@
+"""
+On-disk cache of parsed CVRP instances.
+
+Each instance is stored under a key derived from the file content and the
+distance options, as plain .npy files. Loading memory-maps them, so repeated
+runs skip parsing and parallel workers share the distance matrix pages
+instead of each building a private n x n copy.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from workM import parse_vrp, build_distance_matrix
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "vrp_instances")
+
+
+def instance_key(file_path, dtype=np.float64, rounding=False):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(f"|{np.dtype(dtype).str}|{bool(rounding)}".encode())
+    return digest.hexdigest()
+
+
+def _write_entry(entry_dir, file_path, dtype, rounding):
+    instance = parse_vrp(file_path)
+    distance_matrix = build_distance_matrix(instance["coords"], dtype=dtype, rounding=rounding)
+
+    # Build in a private directory and rename it into place, so a reader
+    # never sees a half-written entry and racing writers are harmless.
+    parent = os.path.dirname(entry_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, prefix=".tmp-")
+    try:
+        np.save(os.path.join(tmp_dir, "coords.npy"), instance["coords"])
+        np.save(os.path.join(tmp_dir, "demands.npy"), instance["demands"])
+        np.save(os.path.join(tmp_dir, "distance_matrix.npy"), distance_matrix)
+        meta = {key: instance[key] for key in ("name", "edge_weight_type", "capacity", "depot")}
+        meta["source"] = os.path.abspath(file_path)
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        os.rename(tmp_dir, entry_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(os.path.join(entry_dir, "meta.json")):
+            raise
+
+
+def load_cached_instance(file_path, cache_dir=DEFAULT_CACHE_DIR, dtype=np.float64, rounding=False):
+    """
+    Same fields as parse_vrp plus "distance_matrix", with the arrays
+    memory-mapped read-only from the cache (returned as plain ndarrays). Builds the entry on a miss.
+    """
+    entry_dir = os.path.join(cache_dir, instance_key(file_path, dtype, rounding))
+    if not os.path.exists(os.path.join(entry_dir, "meta.json")):
+        _write_entry(entry_dir, file_path, dtype, rounding)
+
+    with open(os.path.join(entry_dir, "meta.json"), "r") as file:
+        instance = json.load(file)
+    for name in ("coords", "demands", "distance_matrix"):
+        # A plain ndarray view over the mapped pages: np.memmap indexing goes
+        # through a Python-level __getitem__, which slows every scalar lookup
+        instance[name] = np.load(os.path.join(entry_dir, name + ".npy"), mmap_mode="r").view(np.ndarray)
+    return instance
+
+
+def load_vrp_data_cached(file_path, cache_dir=DEFAULT_CACHE_DIR, dtype=np.float64, rounding=False):
+    """Drop-in replacement for workM.load_vrp_data backed by the cache"""
+    instance = load_cached_instance(file_path, cache_dir, dtype, rounding)
+    num_nodes = len(instance["coords"])
+    demands = dict(zip(range(1, num_nodes + 1), instance["demands"].tolist()))
+
+    return instance["depot"], list(range(1, num_nodes)), instance["capacity"], demands, instance["distance_matrix"]
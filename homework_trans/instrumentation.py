@@ -0,0 +1,96 @@
+"""
+Optional solver instrumentation.
+
+A SolverStats object is passed as stats=... to simulated_annealing,
+operators.Annealer, batch.anneal_batched or solver.solve. The solvers
+only touch it once per temperature step (never per move) and skip it
+entirely when stats is None, so there is no cost when it is disabled.
+
+It records the time spent per phase (load, construction, search),
+evaluations per second, acceptance and improvement rates per operator
+and per temperature step, and a sampled best/current cost trajectory,
+and exports everything as JSON.
+"""
+
+import json
+import time
+from contextlib import contextmanager
+
+
+def _rates(proposals, accepted, improving):
+    return {
+        "proposals": proposals,
+        "accepted": accepted,
+        "improving": improving,
+        "acceptance_rate": accepted / proposals if proposals else 0.0,
+        "improvement_rate": improving / proposals if proposals else 0.0,
+    }
+
+
+class SolverStats:
+
+    def __init__(self, trace_every=10):
+        self.trace_every = trace_every
+        self.phases = {}
+        self.steps = []
+        self.trace = []
+        self.operator_totals = {}
+        self.evaluations = 0
+        self._start = time.perf_counter()
+
+    def add_time(self, name, seconds):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """Times a block and adds it to the named phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def record_step(self, temperature, current_cost, best_cost, names, proposals, accepted, improving):
+        """
+        One temperature step. names/proposals/accepted/improving are
+        parallel per-operator sequences for this step.
+        """
+        operators = {}
+        for name, tried, taken, better in zip(names, proposals, accepted, improving):
+            operators[name] = _rates(tried, taken, better)
+            total = self.operator_totals.setdefault(name, [0, 0, 0])
+            total[0] += tried
+            total[1] += taken
+            total[2] += better
+        step_proposals = sum(proposals)
+        self.evaluations += step_proposals
+        elapsed = time.perf_counter() - self._start
+
+        step = {"step": len(self.steps), "temperature": temperature, "seconds": elapsed}
+        step.update(_rates(step_proposals, sum(accepted), sum(improving)))
+        step["operators"] = operators
+        self.steps.append(step)
+
+        if (len(self.steps) - 1) % self.trace_every == 0:
+            self.trace.append({
+                "evaluations": self.evaluations,
+                "seconds": elapsed,
+                "temperature": temperature,
+                "current_cost": float(current_cost),
+                "best_cost": float(best_cost),
+            })
+
+    def to_dict(self):
+        search_seconds = self.phases.get("search", 0.0)
+        return {
+            "phases": self.phases,
+            "evaluations": self.evaluations,
+            "evaluations_per_second": self.evaluations / search_seconds if search_seconds else None,
+            "operators": {name: _rates(*total) for name, total in self.operator_totals.items()},
+            "steps": self.steps,
+            "trace": self.trace,
+        }
+
+    def to_json(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
@@ -1,14 +1,15 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
 import os
 from workM import run_app
 
 problem_instances = []
 
 def analyze_vrp_results(problem_instances):
+    # Plotting libraries are only needed here, not by the solver
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import seaborn as sns
 
-    
     df = pd.DataFrame(problem_instances, columns=["Problem Type", "Num Nodes", "Solution Quality", "Solve Time"])
     
     corr_matrix = df[["Num Nodes", "Solution Quality", "Solve Time"]].corr()
@@ -64,21 +65,24 @@ def test():
 
 
 
-root_folder = r"C:\Users\CZP\Desktop\启发式作业"
-process_vrp_files(root_folder)
-df_results = analyze_vrp_results(problem_instances)
-print(df_results)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve every A/M/P instance and plot the results")
+    parser.add_argument("root_folder", nargs="?", default=".", help="folder containing A/, M/ and P/")
+    args = parser.parse_args()
+    process_vrp_files(args.root_folder)
+    df_results = analyze_vrp_results(problem_instances)
+    print(df_results)
 
-mean_deviation_A = df_results[df_results["Problem Type"] == "A"]["Solution Quality"].mean()
-mean_deviation_M = df_results[df_results["Problem Type"] == "M"]["Solution Quality"].mean() if "M" in df_results["Problem Type"].values else None
-mean_deviation_P = df_results[df_results["Problem Type"] == "P"]["Solution Quality"].mean() if "P" in df_results["Problem Type"].values else None
+    mean_deviation_A = df_results[df_results["Problem Type"] == "A"]["Solution Quality"].mean()
+    mean_deviation_M = df_results[df_results["Problem Type"] == "M"]["Solution Quality"].mean() if "M" in df_results["Problem Type"].values else None
+    mean_deviation_P = df_results[df_results["Problem Type"] == "P"]["Solution Quality"].mean() if "P" in df_results["Problem Type"].values else None
 
-overall_mean_deviation = df_results["Solution Quality"].mean()
+    overall_mean_deviation = df_results["Solution Quality"].mean()
 
 
-print(f"A 的平均偏差: {mean_deviation_A:.2f}")
-if mean_deviation_M is not None:
-    print(f"M 的平均偏差: {mean_deviation_M:.2f}")
-if mean_deviation_P is not None:
-    print(f"P 的平均偏差: {mean_deviation_P:.2f}")
-print(f"整体平均偏差: {overall_mean_deviation:.2f}")
+    print(f"A 的平均偏差: {mean_deviation_A:.2f}")
+    if mean_deviation_M is not None:
+        print(f"M 的平均偏差: {mean_deviation_M:.2f}")
+    if mean_deviation_P is not None:
+        print(f"P 的平均偏差: {mean_deviation_P:.2f}")
+    print(f"整体平均偏差: {overall_mean_deviation:.2f}")
@@ -0,0 +1,389 @@
+"""
+Neighborhood operators for the CVRP annealer.
+
+Every operator is a pair of functions working on a workM.RouteState:
+
+    evaluate(state, u, v, rng) -> (delta, move) or None
+    apply(state, move)
+
+evaluate scores the move from the edges it changes and returns None when
+it is infeasible (capacity) or does nothing. apply is only called for
+accepted moves and updates the route lists and caches in place.
+u and v are customers; "intra" operators want v from u's route,
+"inter" operators from another route.
+"""
+
+import bisect
+import math
+import random
+
+import numpy as np
+
+from workM import swap_delta, solution_cost
+from polish import RoutePolisher
+
+MAX_SEGMENT = 3  # longest chain moved by or-opt
+
+
+def relocate(state, u, v, rng):
+    """Move u to just after v"""
+    route_u, route_v = state.route_of[u], state.route_of[v]
+    if route_u != route_v and state.loads[route_v] + state.node_demand[u] > state.capacity:
+        return None
+    dm = state.distance_matrix
+    a = state.routes[route_u]
+    i = state.position[u]
+    prev_u, next_u = a[i - 1], a[i + 1]
+    if v == prev_u:
+        return None
+    next_v = state.routes[route_v][state.position[v] + 1]
+    delta = (dm[prev_u, next_u] - dm[prev_u, u] - dm[u, next_u]
+             + dm[v, u] + dm[u, next_v] - dm[v, next_v])
+    return delta, (u, v)
+
+
+def apply_relocate(state, move):
+    u, v = move
+    route_u, route_v = state.route_of[u], state.route_of[v]
+    state.routes[route_u].pop(state.position[u])
+    target = state.routes[route_v]
+    target.insert(target.index(v) + 1, u)
+    state.update_route(route_u)
+    if route_v != route_u:
+        state.update_route(route_v)
+
+
+def exchange(state, u, v, rng):
+    """Swap the positions of u and v, within a route or between two routes"""
+    route_u, route_v = state.route_of[u], state.route_of[v]
+    i, j = state.position[u], state.position[v]
+    if route_u == route_v:
+        return swap_delta(state.routes[route_u], i, j, state.distance_matrix), (u, v)
+
+    demand_u, demand_v = state.node_demand[u], state.node_demand[v]
+    if (state.loads[route_u] - demand_u + demand_v > state.capacity
+            or state.loads[route_v] - demand_v + demand_u > state.capacity):
+        return None
+    dm = state.distance_matrix
+    a, b = state.routes[route_u], state.routes[route_v]
+    prev_u, next_u, prev_v, next_v = a[i - 1], a[i + 1], b[j - 1], b[j + 1]
+    delta = (dm[prev_u, v] + dm[v, next_u] + dm[prev_v, u] + dm[u, next_v]
+             - dm[prev_u, u] - dm[u, next_u] - dm[prev_v, v] - dm[v, next_v])
+    return delta, (u, v)
+
+
+def apply_exchange(state, move):
+    u, v = move
+    route_u, route_v = state.route_of[u], state.route_of[v]
+    i, j = state.position[u], state.position[v]
+    state.routes[route_u][i], state.routes[route_v][j] = v, u
+    state.update_route(route_u)
+    if route_v != route_u:
+        state.update_route(route_v)
+
+
+def two_opt(state, u, v, rng):
+    """Reverse the part of a route from u to v"""
+    route_idx = state.route_of[u]
+    if state.route_of[v] != route_idx:
+        return None
+    i, j = state.position[u], state.position[v]
+    if i > j:
+        i, j = j, i
+    dm = state.distance_matrix
+    route = state.routes[route_idx]
+    before, first, last, after = route[i - 1], route[i], route[j], route[j + 1]
+    delta = dm[before, last] + dm[first, after] - dm[before, first] - dm[last, after]
+    return delta, (route_idx, i, j)
+
+
+def apply_two_opt(state, move):
+    route_idx, i, j = move
+    route = state.routes[route_idx]
+    route[i:j + 1] = route[i:j + 1][::-1]
+    state.update_route(route_idx)
+
+
+def two_opt_star(state, u, v, rng):
+    """Exchange the tails of two routes after u and after v"""
+    route_u, route_v = state.route_of[u], state.route_of[v]
+    if route_u == route_v:
+        return None
+    a, b = state.routes[route_u], state.routes[route_v]
+    i, j = state.position[u], state.position[v]
+    demand = state.node_demand
+    head_a = sum(demand[node] for node in a[1:i + 1])
+    head_b = sum(demand[node] for node in b[1:j + 1])
+    if (head_a + state.loads[route_v] - head_b > state.capacity
+            or head_b + state.loads[route_u] - head_a > state.capacity):
+        return None
+    dm = state.distance_matrix
+    next_u, next_v = a[i + 1], b[j + 1]
+    delta = dm[u, next_v] + dm[v, next_u] - dm[u, next_u] - dm[v, next_v]
+    return delta, (u, v)
+
+
+def apply_two_opt_star(state, move):
+    u, v = move
+    route_u, route_v = state.route_of[u], state.route_of[v]
+    a, b = state.routes[route_u], state.routes[route_v]
+    i, j = state.position[u], state.position[v]
+    state.routes[route_u] = a[:i + 1] + b[j + 1:]
+    state.routes[route_v] = b[:j + 1] + a[i + 1:]
+    state.update_route(route_u)
+    state.update_route(route_v)
+
+
+def or_opt(state, u, v, rng):
+    """Move the chain of up to MAX_SEGMENT customers starting at u to just after v"""
+    route_u, route_v = state.route_of[u], state.route_of[v]
+    a = state.routes[route_u]
+    i = state.position[u]
+    length = min(rng.randint(1, MAX_SEGMENT), len(a) - 1 - i)
+    if route_u == route_v:
+        j = state.position[v]
+        if i - 1 <= j < i + length:
+            return None
+    else:
+        segment_load = sum(state.node_demand[node] for node in a[i:i + length])
+        if state.loads[route_v] + segment_load > state.capacity:
+            return None
+    dm = state.distance_matrix
+    before, first, last, after = a[i - 1], a[i], a[i + length - 1], a[i + length]
+    next_v = state.routes[route_v][state.position[v] + 1]
+    delta = (dm[before, after] - dm[before, first] - dm[last, after]
+             + dm[v, first] + dm[last, next_v] - dm[v, next_v])
+    return delta, (u, v, length)
+
+
+def apply_or_opt(state, move):
+    u, v, length = move
+    route_u, route_v = state.route_of[u], state.route_of[v]
+    a = state.routes[route_u]
+    i = state.position[u]
+    segment = a[i:i + length]
+    del a[i:i + length]
+    target = state.routes[route_v]
+    insert_at = target.index(v) + 1
+    target[insert_at:insert_at] = segment
+    state.update_route(route_u)
+    if route_v != route_u:
+        state.update_route(route_v)
+
+
+# name -> (evaluate, apply, scope)
+OPERATORS = {
+    "relocate": (relocate, apply_relocate, "any"),
+    "exchange": (exchange, apply_exchange, "any"),
+    "two_opt": (two_opt, apply_two_opt, "intra"),
+    "two_opt_star": (two_opt_star, apply_two_opt_star, "inter"),
+    "or_opt": (or_opt, apply_or_opt, "any"),
+}
+DEFAULT_OPERATORS = ["relocate", "exchange", "two_opt", "two_opt_star", "or_opt"]
+
+
+class AdaptiveSelector:
+    """
+    Roulette-wheel choice of operators. After each temperature step the
+    weights move towards each operator's improvement rate (improving
+    accepted moves per proposal), relative to the best operator.
+    """
+
+    def __init__(self, names, reaction=0.3, min_weight=0.05):
+        self.names = list(names)
+        self.reaction = reaction
+        self.min_weight = min_weight
+        self.weights = [1.0] * len(self.names)
+        self.attempts = [0] * len(self.names)
+        self.improvements = [0] * len(self.names)
+        self._rebuild()
+
+    def _rebuild(self):
+        self._cumulative = []
+        total = 0.0
+        for weight in self.weights:
+            total += weight
+            self._cumulative.append(total)
+
+    def select(self, rng):
+        return bisect.bisect_right(self._cumulative, rng.random() * self._cumulative[-1])
+
+    def record(self, k, improved):
+        self.attempts[k] += 1
+        if improved:
+            self.improvements[k] += 1
+
+    def update(self):
+        rates = [improved / tried if tried else None for improved, tried in zip(self.improvements, self.attempts)]
+        best_rate = max((rate for rate in rates if rate is not None), default=0)
+        if best_rate > 0:
+            for k, rate in enumerate(rates):
+                if rate is not None:
+                    weight = (1 - self.reaction) * self.weights[k] + self.reaction * rate / best_rate
+                    self.weights[k] = max(weight, self.min_weight)
+            self._rebuild()
+        self.attempts = [0] * len(self.names)
+        self.improvements = [0] * len(self.names)
+
+
+def nearest_neighbors(coords, k, depot, chunk_size=1024):
+    """
+    For every node, its k nearest customers (never itself or the depot),
+    closest first, as an (n, k) array. Computed from the coordinates a
+    block of rows at a time, so it never needs the full distance matrix.
+    """
+    num_nodes = len(coords)
+    k = min(k, num_nodes - 2)
+    neighbors = np.empty((num_nodes, k), dtype=np.int32)
+    x, y = coords[:, 0], coords[:, 1]
+    for start in range(0, num_nodes, chunk_size):
+        stop = min(start + chunk_size, num_nodes)
+        dx = x[start:stop, None] - x[None, :]
+        dy = y[start:stop, None] - y[None, :]
+        block = dx * dx + dy * dy
+        block[:, depot] = np.inf
+        block[np.arange(stop - start), np.arange(start, stop)] = np.inf
+        nearest = np.argpartition(block, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(block, nearest, axis=1), axis=1, kind="stable")
+        neighbors[start:stop] = np.take_along_axis(nearest, order, axis=1)
+    return neighbors
+
+
+def sample_pair(state, scope, customers, rng, neighbors=None):
+    """
+    A random customer u and a partner v for an operator with the given scope.
+    With neighbor lists the partner is one of u's k nearest customers
+    (a granular neighborhood), whatever the scope.
+    """
+    u = customers[rng.randrange(len(customers))]
+    if neighbors is not None:
+        candidates = neighbors[u]
+        v = candidates[rng.randrange(len(candidates))]
+    elif scope == "intra":
+        route = state.routes[state.route_of[u]]
+        if len(route) < 4:
+            return u, None
+        v = route[rng.randint(1, len(route) - 2)]
+    else:
+        v = customers[rng.randrange(len(customers))]
+    if v == u:
+        return u, None
+    return u, v
+
+
+class Annealer:
+    """
+    Annealing chain over the given operators, picked adaptively, driven one
+    temperature step at a time by run(). state is modified in place and is
+    always the current solution; the best one is kept aside.
+    neighbors, from nearest_neighbors(), restricts proposals to pairs of
+    near customers. stats (instrumentation.SolverStats) gets one record
+    per temperature step.
+    """
+
+    def __init__(self, state, operators=DEFAULT_OPERATORS, rng=random, neighbors=None, stats=None):
+        self.state = state
+        self.stats = stats
+        self.rng = rng
+        self.neighbors = None if neighbors is None else np.asarray(neighbors).tolist()
+        self.evaluators = [OPERATORS[name][0] for name in operators]
+        self.appliers = [OPERATORS[name][1] for name in operators]
+        self.scopes = [OPERATORS[name][2] for name in operators]
+        self.selector = AdaptiveSelector(operators)
+        self.customers = [node for route in state.routes for node in route[1:-1]]
+        self.current_cost = sum(state.costs)
+        self.best_cost = self.current_cost
+        self.evaluations = 0
+        # The best solution is only copied when the search moves away from it
+        self._best_solution = None
+        self._current_is_best = True
+
+    def run(self, temp, iterations):
+        """One temperature step of `iterations` proposals. Returns True if the best cost improved."""
+        if len(self.customers) < 2:
+            return False
+        state, rng, neighbors, customers = self.state, self.rng, self.neighbors, self.customers
+        selector, evaluators, appliers, scopes = self.selector, self.evaluators, self.appliers, self.scopes
+        current_cost, best_cost, current_is_best = self.current_cost, self.best_cost, self._current_is_best
+        improved = False
+        accepts = [0] * len(evaluators)
+
+        for _ in range(iterations):
+            k = selector.select(rng)
+            u, v = sample_pair(state, scopes[k], customers, rng, neighbors)
+            result = None if v is None else evaluators[k](state, u, v, rng)
+            if result is None:
+                selector.record(k, False)
+                continue
+            delta, move = result
+
+            accepted = delta < 0 or math.exp(-delta / temp) > rng.random()
+            selector.record(k, accepted and delta < 0)
+            if not accepted:
+                continue
+            accepts[k] += 1
+            new_cost = current_cost + delta
+            if current_is_best and not new_cost < best_cost:
+                self._best_solution = state.snapshot()
+                current_is_best = False
+            appliers[k](state, move)
+            current_cost = new_cost
+            if new_cost < best_cost:
+                best_cost = new_cost
+                current_is_best = improved = True
+        if self.stats is not None:
+            self.stats.record_step(temp, current_cost, best_cost, selector.names, selector.attempts, accepts,
+                                   selector.improvements)
+        selector.update()
+
+        self.evaluations += iterations
+        self.current_cost, self.best_cost, self._current_is_best = current_cost, best_cost, current_is_best
+        return improved
+
+    def best(self):
+        """Copy of the best solution (empty routes dropped) and its cost"""
+        solution = self.state.snapshot() if self._current_is_best else self._best_solution
+        solution = [route for route in solution if len(route) > 2]
+        return solution, solution_cost(solution, self.state.distance_matrix)
+
+    def polish(self, polisher):
+        """
+        Re-orders every route of the current solution with polisher
+        (polish.RoutePolisher). Returns True if the best cost improved.
+        """
+        state = self.state
+        for route_idx, route in enumerate(state.routes):
+            new_route, cost = polisher.polish(route)
+            if cost < state.costs[route_idx]:
+                route[:] = new_route
+                state.update_route(route_idx)
+        self.current_cost = sum(state.costs)
+        improved = self.current_cost < self.best_cost
+        if improved or self._current_is_best:
+            self.best_cost = self.current_cost
+            self._current_is_best = True
+        return improved
+
+
+def anneal(state, temp_initial, temp_final, cooling_rate, max_iterations, operators=DEFAULT_OPERATORS, rng=random,
+           neighbors=None, stats=None, polish_interval=None):
+    """
+    Geometric-schedule annealing with an Annealer.
+    polish_interval (steps) re-orders the routes exactly or by local search
+    (polish.RoutePolisher) every that many steps and polishes the result.
+    Returns the best solution (empty routes dropped) and its cost.
+    """
+    annealer = Annealer(state, operators, rng, neighbors, stats)
+    polisher = None if polish_interval is None else RoutePolisher(state.distance_matrix, state.depot)
+    temp = temp_initial
+    step = 0
+    while temp > temp_final:
+        annealer.run(temp, max_iterations)
+        step += 1
+        if polisher is not None and step % polish_interval == 0:
+            annealer.polish(polisher)
+        temp *= cooling_rate
+    routes, cost = annealer.best()
+    if polisher is not None:
+        routes, cost = polisher.polish_solution(routes)
+    return routes, cost
@@ -0,0 +1,182 @@
+"""
+Multi-chain annealing on a process pool.
+
+K chains anneal from the Clarke-Wright solution, each with its own seed
+and starting temperature. The schedule is cut into rounds; between rounds
+the chains can
+
+    "independent"  just keep going (multi-start),
+    "tempering"    swap states between neighbouring temperatures (parallel tempering),
+    "share_best"   restart every chain that is behind from the best solution found.
+
+Without a time limit the chains follow workM's fixed schedule. With one,
+the chains start at an estimated temperature (solver.estimate_temperature)
+and cool with elapsed time instead of steps, so they reach temp_final
+exactly when the budget runs out.
+
+The distance matrix is placed in shared memory once and attached by every
+worker, so it is not pickled per task.
+"""
+
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import workM
+from workM import RouteState, initial_solution, solution_cost
+from operators import anneal, Annealer, DEFAULT_OPERATORS
+from solver import estimate_temperature
+
+MODES = ("independent", "tempering", "share_best")
+
+# Per-worker instance, set by _init_worker
+_instance = None
+
+
+def _init_worker(shm_name, shape, dtype, depot, capacity, demands):
+    global _instance
+    shm = shared_memory.SharedMemory(name=shm_name)
+    distance_matrix = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    # Keep the SharedMemory object alive as long as the array that views it
+    _instance = (shm, depot, capacity, demands, distance_matrix)
+
+
+def _run_segment(routes, temp_start, temp_end, seed, operators, seconds=None):
+    """
+    Anneals one chain from temp_start down to temp_end, returns its current
+    and best state. With seconds the temperature falls geometrically with
+    elapsed time and reaches temp_end when they are up.
+    """
+    _, depot, capacity, demands, distance_matrix = _instance
+    state = RouteState(routes, depot, demands, distance_matrix, capacity)
+    start = time.time()
+    if seconds is None:
+        # Chains already at the final temperature still do one step per round
+        temp_end = min(temp_end, temp_start * workM.cooling_rate)
+        best_routes, best_cost = anneal(state, temp_start, temp_end, workM.cooling_rate, workM.max_iterations,
+                                        operators, random.Random(seed))
+    else:
+        annealer = Annealer(state, operators, random.Random(seed))
+        while True:
+            fraction = (time.time() - start) / seconds
+            if fraction >= 1:
+                break
+            annealer.run(temp_start * (temp_end / temp_start) ** fraction, workM.max_iterations)
+        best_routes, best_cost = annealer.best()
+    current_routes = [route for route in state.routes if len(route) > 2]
+    return current_routes, sum(state.costs), best_routes, best_cost, time.time() - start
+
+
+def chain_temperatures(chains, temp_hot, temp_cold):
+    """Geometric ladder of starting temperatures from hot to cold"""
+    if chains == 1:
+        return [temp_hot]
+    ratio = (temp_cold / temp_hot) ** (1 / (chains - 1))
+    return [temp_hot * ratio ** k for k in range(chains)]
+
+
+def parallel_annealing(depot, customers, capacity, demands, distance_matrix, max_vehicles,
+                       chains=4, mode="independent", temperatures=None, seeds=None, rounds=20,
+                       workers=None, operators=DEFAULT_OPERATORS, time_limit=None, seed=0, temp_final=None):
+    """
+    Runs `chains` annealing chains in parallel and returns
+    (best_routes, best_cost, traces), where traces[k] has one entry per
+    round for chain k. temperatures defaults to workM.temp_initial for
+    every chain, or a hot-to-cold ladder in tempering mode, and temp_final
+    to workM.temp_final. With time_limit (seconds) the budget is split
+    evenly over the rounds, the hottest temperature is estimated from
+    sampled moves and temp_final defaults to 1/1000 of it.
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    start = time.time()
+    routes = initial_solution(depot, customers, capacity, demands, distance_matrix, max_vehicles)
+    if temperatures is None:
+        temp_hot = workM.temp_initial
+        if time_limit is not None:
+            state = RouteState([route[:] for route in routes], depot, demands, distance_matrix, capacity)
+            temp_hot = estimate_temperature(state, operators, random.Random(seed))
+        temperatures = chain_temperatures(chains, temp_hot, temp_hot / 100) if mode == "tempering" \
+            else [temp_hot] * chains
+    if temp_final is None:
+        temp_final = workM.temp_final if time_limit is None else max(temperatures) / 1000
+    if seeds is None:
+        seeds = [seed * 1000 + k for k in range(chains)]
+    if len(temperatures) != chains or len(seeds) != chains:
+        raise ValueError("temperatures and seeds need one entry per chain")
+
+    current = [[route[:] for route in routes] for _ in range(chains)]
+    current_costs = [solution_cost(routes, distance_matrix)] * chains
+    best_routes, best_cost = routes, current_costs[0]
+    traces = [[] for _ in range(chains)]
+
+    # Every chain cools by the same factor per round, so all reach temp_final together
+    if time_limit is None:
+        steps = max(math.log(temp_final / max(temperatures)) / math.log(workM.cooling_rate), 1)
+        round_factor = workM.cooling_rate ** math.ceil(steps / rounds)
+    else:
+        round_factor = (temp_final / max(temperatures)) ** (1 / rounds)
+        # Chains beyond the worker count wait for a free worker, so a round takes this many segments
+        batches = math.ceil(chains / (workers or os.cpu_count() or 1))
+    temps = list(temperatures)
+    exchange_rng = random.Random(seed)
+
+    matrix = np.ascontiguousarray(distance_matrix)
+    shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+    try:
+        np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=shm.buf)[:] = matrix
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(shm.name, matrix.shape, matrix.dtype, depot, capacity, demands)) as pool:
+            for round_idx in range(rounds):
+                seconds = None
+                if time_limit is not None:
+                    remaining_time = time_limit - (time.time() - start)
+                    if remaining_time <= 0:
+                        break
+                    # What is left is shared by the remaining rounds, which absorbs the pool overhead
+                    seconds = remaining_time / (rounds - round_idx) / batches
+                futures = [
+                    pool.submit(_run_segment, current[k], temps[k], max(temps[k] * round_factor, temp_final),
+                                seeds[k] * 100003 + round_idx, operators, seconds)
+                    for k in range(chains)
+                ]
+                for k, future in enumerate(futures):
+                    current[k], current_costs[k], chain_best, chain_best_cost, elapsed = future.result()
+                    if chain_best_cost < best_cost:
+                        best_routes, best_cost = chain_best, chain_best_cost
+                    traces[k].append({
+                        "round": round_idx,
+                        "temperature": temps[k],
+                        "current_cost": current_costs[k],
+                        "best_cost": chain_best_cost,
+                        "seconds": elapsed,
+                    })
+                temps = [max(temp * round_factor, temp_final) for temp in temps]
+
+                if mode == "tempering":
+                    # Metropolis swap between neighbouring chains, sorted hot to cold
+                    ladder = sorted(range(chains), key=lambda k: -temps[k])
+                    for hot, cold in zip(ladder, ladder[1:]):
+                        exponent = (current_costs[cold] - current_costs[hot]) * (1 / temps[cold] - 1 / temps[hot])
+                        if exponent >= 0 or exchange_rng.random() < math.exp(exponent):
+                            current[hot], current[cold] = current[cold], current[hot]
+                            current_costs[hot], current_costs[cold] = current_costs[cold], current_costs[hot]
+                            traces[hot][-1]["exchanged_with"] = cold
+                elif mode == "share_best":
+                    for k in range(chains):
+                        if current_costs[k] > best_cost:
+                            current[k] = [route[:] for route in best_routes]
+                            current_costs[k] = best_cost
+
+                if time_limit is None and all(temp <= temp_final for temp in temps):
+                    break
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return best_routes, best_cost, traces
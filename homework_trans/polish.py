@@ -0,0 +1,145 @@
+"""
+Per-route polishing of the visiting order.
+
+Routes of up to MAX_EXACT customers are solved exactly with Held-Karp
+dynamic programming. The DP table dp[subset, last] is filled one subset
+size at a time, with all subsets of that size relaxed together in NumPy.
+Longer routes get 2-opt and or-opt local search until neither improves.
+Results are memoized by the route's customer set: an exact order is
+final, and a local-search order is reused as long as it beats the order
+it is given.
+"""
+
+import numpy as np
+
+from workM import TIE_TOLERANCE, total_distance
+
+MAX_EXACT = 12
+OR_OPT_SEGMENT = 3
+
+
+def held_karp(customers, depot, distance_matrix):
+    """Shortest depot -> all customers -> depot order, by DP over subsets"""
+    k = len(customers)
+    if k <= 2:
+        return list(customers)
+    nodes = np.asarray(customers)
+    d = distance_matrix[np.ix_(nodes, nodes)]
+    full = (1 << k) - 1
+    dp = np.full((1 << k, k), np.inf)
+    parent = np.full((1 << k, k), -1, dtype=np.int64)
+    bits = 1 << np.arange(k)
+    dp[bits, np.arange(k)] = distance_matrix[depot, nodes]
+
+    masks = np.arange(1 << k)
+    popcount = np.zeros(1 << k, dtype=np.int64)
+    for j in range(k):
+        popcount += (masks >> j) & 1
+    for size in range(1, k):
+        layer = masks[popcount == size]
+        # best[m, j]: cheapest way to extend a path over layer[m] to customer j
+        extend = dp[layer][:, :, None] + d[None, :, :]
+        best_last = extend.argmin(axis=1)
+        best = np.take_along_axis(extend, best_last[:, None, :], axis=1)[:, 0, :]
+        for j in range(k):
+            open_ = (layer & bits[j]) == 0
+            targets = layer[open_] | bits[j]
+            values = best[open_, j]
+            better = values < dp[targets, j]
+            dp[targets[better], j] = values[better]
+            parent[targets[better], j] = best_last[open_, j][better]
+
+    last = int(np.argmin(dp[full] + distance_matrix[nodes, depot]))
+    order, mask = [], full
+    while last != -1:
+        order.append(last)
+        last, mask = int(parent[mask, last]), mask & ~(1 << last)
+    return nodes[order[::-1]].tolist()
+
+
+def two_opt_route(route, distance_matrix):
+    """Best-improvement 2-opt on [depot, ..., depot], in place until no reversal improves"""
+    dm = distance_matrix
+    while len(route) > 4:
+        nodes = np.asarray(route)
+        prev, curr = nodes[:-2], nodes[1:-1]  # edge (prev[i], curr[i]) enters position i + 1
+        nxt = nodes[2:]
+        # Reversing positions i..j (1-based inside the route) replaces edges
+        # (route[i-1], route[i]) and (route[j], route[j+1])
+        delta = (dm[prev[:, None], curr[None, :]] + dm[curr[:, None], nxt[None, :]]
+                 - dm[prev, curr][:, None] - dm[curr, nxt][None, :])
+        delta = np.triu(delta, k=1) + np.tril(np.full_like(delta, np.inf))
+        i, j = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[i, j] >= -TIE_TOLERANCE:
+            break
+        route[i + 1:j + 2] = route[i + 1:j + 2][::-1]
+    return route
+
+
+def or_opt_route(route, distance_matrix, max_segment=OR_OPT_SEGMENT):
+    """Moves one segment of up to max_segment customers to a better place; False if none improves"""
+    dm = distance_matrix
+    n = len(route)
+    for length in range(1, max_segment + 1):
+        for start in range(1, n - length):
+            end = start + length - 1
+            before, after = route[start - 1], route[end + 1]
+            first, last = route[start], route[end]
+            removed = dm[before, first] + dm[last, after] - dm[before, after]
+            rest = route[:start] + route[end + 1:]
+            a, b = np.asarray(rest[:-1]), np.asarray(rest[1:])
+            # Inserted forwards between a and b, or reversed
+            forward = dm[a, first] + dm[last, b] - dm[a, b]
+            backward = dm[a, last] + dm[first, b] - dm[a, b]
+            gains = np.minimum(forward, backward) - removed
+            pos = int(np.argmin(gains))
+            if gains[pos] < -TIE_TOLERANCE:
+                segment = route[start:end + 1]
+                if backward[pos] < forward[pos]:
+                    segment = segment[::-1]
+                route[:] = rest[:pos + 1] + segment + rest[pos + 1:]
+                return True
+    return False
+
+
+class RoutePolisher:
+
+    def __init__(self, distance_matrix, depot, max_exact=MAX_EXACT):
+        self.distance_matrix = distance_matrix
+        self.depot = depot
+        self.max_exact = max_exact
+        self.cache = {}  # frozenset of customers -> (route, cost, exact)
+        self.hits = 0
+
+    def polish(self, route):
+        """Best known order of the route's customers, as a new route, and its cost"""
+        dm = self.distance_matrix
+        cost = total_distance(route, dm)
+        if len(route) <= 4:
+            return route[:], cost
+        key = frozenset(route[1:-1])
+        cached = self.cache.get(key)
+        if cached is not None and (cached[2] or cached[1] <= cost):
+            self.hits += 1
+            return cached[0][:], cached[1]
+
+        if len(route) - 2 <= self.max_exact:
+            new_route = [self.depot] + held_karp(route[1:-1], self.depot, dm) + [self.depot]
+            exact = True
+        else:
+            new_route = route[:]
+            while True:
+                two_opt_route(new_route, dm)
+                if not or_opt_route(new_route, dm):
+                    break
+            exact = False
+        new_cost = total_distance(new_route, dm)
+        if not new_cost < cost - TIE_TOLERANCE:
+            new_route, new_cost = route[:], cost
+        self.cache[key] = (new_route, new_cost, exact)
+        return new_route[:], new_cost
+
+    def polish_solution(self, routes):
+        """Every route polished; returns the new routes and their total cost"""
+        polished = [self.polish(route) for route in routes]
+        return [route for route, _ in polished], sum(cost for _, cost in polished)
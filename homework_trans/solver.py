@@ -0,0 +1,165 @@
+"""
+Anytime CVRP solving under a wall-clock and/or evaluation budget.
+
+Instead of the fixed module-level schedule of workM, the cooling rate is
+derived from the budget: after every temperature step the remaining
+budget is turned into a number of remaining steps (using the measured
+evaluation rate for time budgets), and the rate is set so the
+temperature reaches temp_final exactly when the budget runs out. When the
+best cost has not improved for `stagnation_steps` steps the chain is
+reheated; once `max_reheats` is used up it stops early. Whatever
+happens, the best solution found so far is returned.
+
+    result = solve(*load_vrp_data(path), max_vehicles, time_limit=30,
+                   progress=lambda info: print(info["elapsed"], info["best_cost"]))
+"""
+
+import math
+import random
+import time
+
+import numpy as np
+
+from workM import RouteState, initial_solution
+from operators import Annealer, DEFAULT_OPERATORS, sample_pair, OPERATORS
+from polish import RoutePolisher
+
+ITERATIONS_PER_STEP = 500
+COLD_FRACTION = 0.1  # below this fraction of temp_initial the chain counts as cold
+
+
+def estimate_temperature(state, operators=DEFAULT_OPERATORS, rng=random, samples=500, quantile=0.05, acceptance=0.5,
+                         neighbors=None):
+    """
+    Temperature at which a small uphill move (the given quantile of sampled
+    uphill deltas) is accepted with the given probability. Starting hotter
+    than that throws away most of a good initial solution.
+    """
+    customers = [node for route in state.routes for node in route[1:-1]]
+    if len(customers) < 2:
+        return 1.0
+    neighbors = None if neighbors is None else np.asarray(neighbors).tolist()
+    uphill = []
+    for _ in range(samples):
+        evaluate, _, scope = OPERATORS[operators[rng.randrange(len(operators))]]
+        u, v = sample_pair(state, scope, customers, rng, neighbors)
+        result = None if v is None else evaluate(state, u, v, rng)
+        if result is not None and result[0] > 0:
+            uphill.append(result[0])
+    if not uphill:
+        return 1.0
+    return -float(np.quantile(uphill, quantile)) / math.log(acceptance)
+
+
+def solve(depot, customers, capacity, demands, distance_matrix, max_vehicles, time_limit=None, max_evaluations=None,
+          temp_initial=None, temp_final=None, operators=DEFAULT_OPERATORS, neighbors=None, rng=random,
+          iterations_per_step=ITERATIONS_PER_STEP, stagnation_steps=200, reheat_factor=0.5, max_reheats=5,
+          progress=None, progress_interval=1.0, initial_routes=None, stats=None, polish_interval=None):
+    """
+    Anneals until the time limit (seconds) or evaluation budget is spent,
+    or the cold chain stagnates after max_reheats reheats. Without any budget
+    it runs one derived schedule of 1000 steps. temp_initial defaults to a
+    temperature estimated from sampled moves (estimate_temperature),
+    temp_final to 1/1000 of it.
+
+    progress(info) is called at most every progress_interval seconds and
+    whenever the best cost improves, with elapsed, evaluations,
+    temperature, current_cost, best_cost and best_routes.
+
+    stats (instrumentation.SolverStats) records every temperature step and
+    the construction/search time split. polish_interval (steps) re-orders
+    the routes with polish.RoutePolisher every that many steps and at the end.
+
+    Returns a dict with routes, cost, evaluations, elapsed, reheats and
+    stop_reason ("time", "evaluations", "schedule" or "stagnation").
+    """
+    start = time.time()
+    if initial_routes is None:
+        initial_routes = initial_solution(depot, customers, capacity, demands, distance_matrix, max_vehicles)
+    if stats is not None:
+        stats.add_time("construction", time.time() - start)
+    search_start = time.time()
+    state = RouteState(initial_routes, depot, demands, distance_matrix, capacity)
+    annealer = Annealer(state, operators, rng, neighbors, stats)
+    polisher = None if polish_interval is None else RoutePolisher(distance_matrix, depot)
+
+    if temp_initial is None:
+        temp_initial = estimate_temperature(state, operators, rng, neighbors=neighbors)
+    if temp_final is None:
+        temp_final = temp_initial / 1000
+    if time_limit is None and max_evaluations is None:
+        max_evaluations = 1000 * iterations_per_step
+
+    temp = temp_initial
+    step = 0
+    schedule_start, schedule_evaluations = time.time(), 0
+    steps_since_improvement = 0
+    reheats = 0
+    last_report = start
+    stop_reason = None
+
+    while True:
+        improved = annealer.run(temp, iterations_per_step)
+        step += 1
+        if polisher is not None and step % polish_interval == 0:
+            improved = annealer.polish(polisher) or improved
+        now = time.time()
+        # Stagnation only counts once the chain is cold; hot steps rarely improve the best
+        cold = temp < temp_initial * COLD_FRACTION
+        steps_since_improvement = steps_since_improvement + 1 if cold and not improved else 0
+
+        if progress is not None and (improved or now - last_report >= progress_interval):
+            progress({
+                "elapsed": now - start,
+                "evaluations": annealer.evaluations,
+                "temperature": temp,
+                "current_cost": annealer.current_cost,
+                "best_cost": annealer.best_cost,
+                "best_routes": annealer.best()[0],
+            })
+            last_report = now
+
+        # Remaining temperature steps allowed by each budget
+        remaining_steps = []
+        if time_limit is not None:
+            remaining_time = time_limit - (now - start)
+            if remaining_time <= 0:
+                stop_reason = "time"
+                break
+            rate = (annealer.evaluations - schedule_evaluations) / max(now - schedule_start, 1e-9)
+            remaining_steps.append(remaining_time * rate / iterations_per_step)
+        if max_evaluations is not None:
+            remaining_evaluations = max_evaluations - annealer.evaluations
+            if remaining_evaluations < iterations_per_step:
+                stop_reason = "evaluations"
+                break
+            remaining_steps.append(remaining_evaluations / iterations_per_step)
+        remaining = max(min(remaining_steps), 1)
+
+        stagnated = steps_since_improvement >= stagnation_steps
+        if temp <= temp_final or stagnated:
+            if reheats >= max_reheats:
+                stop_reason = "stagnation" if stagnated else "schedule"
+                break
+            # Reheat from the current solution and spread the rest of the budget over a new schedule
+            reheats += 1
+            temp = max(temp_initial * reheat_factor ** reheats, temp_final * 2)
+            steps_since_improvement = 0
+            schedule_start, schedule_evaluations = now, annealer.evaluations
+            continue
+
+        temp *= (temp_final / temp) ** (1 / remaining)
+
+    routes, cost = annealer.best()
+    if polisher is not None:
+        routes, cost = polisher.polish_solution(routes)
+    if stats is not None:
+        stats.add_time("search", time.time() - search_start)
+    return {
+        "routes": routes,
+        "cost": cost,
+        "evaluations": annealer.evaluations,
+        "elapsed": time.time() - start,
+        "reheats": reheats,
+        "stop_reason": stop_reason,
+    }
@@ -0,0 +1,156 @@
+"""
+Array-backed CVRP solution.
+
+All customers are kept in one giant-tour array; route r is the slice
+tour[offsets[r]:offsets[r + 1]] and the depot is implicit at both ends.
+succ/pred/route_of/position are indexed by node, so membership and
+neighbour lookups are O(1), and moves are applied in place on the
+preallocated arrays. The list-of-routes form used by the rest of the
+solver ([depot, c1, c2, ..., depot] per route) converts both ways
+without loss.
+"""
+
+import numpy as np
+
+
+class GiantTour:
+
+    def __init__(self, tour, offsets, depot, num_nodes, demands=None):
+        self.depot = depot
+        self.num_nodes = num_nodes
+        self.tour = np.asarray(tour, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.succ = np.full(num_nodes, -1, dtype=np.int32)
+        self.pred = np.full(num_nodes, -1, dtype=np.int32)
+        self.route_of = np.full(num_nodes, -1, dtype=np.int32)
+        self.position = np.full(num_nodes, -1, dtype=np.int64)
+        # Per-node demand (depot 0) and per-route load, if demands are known
+        self.node_demand = None
+        self.loads = None
+        if demands is not None:
+            self.node_demand = np.array([demands.get(node + 1, 0) for node in range(num_nodes)], dtype=np.int64)
+            self.node_demand[depot] = 0
+        self._index_all()
+
+    @classmethod
+    def from_routes(cls, routes, depot, num_nodes, demands=None):
+        """From the list form, [depot, c1, ..., ck, depot] per route"""
+        lengths = [len(route) - 2 for route in routes]
+        offsets = np.zeros(len(routes) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(lengths)
+        tour = [node for route in routes for node in route[1:-1]]
+        return cls(tour, offsets, depot, num_nodes, demands)
+
+    def to_routes(self, drop_empty=True):
+        """Back to the list form; empty routes are left out unless drop_empty=False"""
+        routes = []
+        for r in range(self.num_routes):
+            customers = self.tour[self.offsets[r]:self.offsets[r + 1]].tolist()
+            if customers or not drop_empty:
+                routes.append([self.depot] + customers + [self.depot])
+        return routes
+
+    @property
+    def num_routes(self):
+        return len(self.offsets) - 1
+
+    def _index_all(self):
+        positions = np.arange(len(self.tour))
+        self.position[self.tour] = positions
+        self.route_of[self.tour] = np.repeat(np.arange(self.num_routes, dtype=np.int32), np.diff(self.offsets))
+        self._relink_range(0, len(self.tour))
+        if self.node_demand is not None:
+            self.loads = np.bincount(self.route_of[self.tour], weights=self.node_demand[self.tour],
+                                     minlength=self.num_routes).astype(np.int64)
+
+    def _relink_range(self, start, stop):
+        """Recomputes succ/pred for the customers at tour positions [start, stop)"""
+        start, stop = max(start, 0), min(stop, len(self.tour))
+        if start >= stop:
+            return
+        nodes = self.tour[start:stop]
+        positions = np.arange(start, stop)
+        route_start = self.offsets[self.route_of[nodes]]
+        route_stop = self.offsets[self.route_of[nodes] + 1]
+        self.pred[nodes] = np.where(positions > route_start, self.tour[np.maximum(positions - 1, 0)], self.depot)
+        self.succ[nodes] = np.where(positions + 1 < route_stop, self.tour[np.minimum(positions + 1, len(self.tour) - 1)], self.depot)
+
+    def contains(self, route, node):
+        return self.route_of[node] == route
+
+    def route(self, r):
+        """View of the customers of route r, in visiting order"""
+        return self.tour[self.offsets[r]:self.offsets[r + 1]]
+
+    def route_cost(self, r, distance_matrix):
+        customers = self.route(r)
+        if len(customers) == 0:
+            return 0.0
+        inner = distance_matrix[customers[:-1], customers[1:]].sum() if len(customers) > 1 else 0.0
+        return distance_matrix[self.depot, customers[0]] + inner + distance_matrix[customers[-1], self.depot]
+
+    def total_cost(self, distance_matrix):
+        """Sum of all edges, read through the succ array"""
+        customers = self.tour
+        if len(customers) == 0:
+            return 0.0
+        starts = self.offsets[:-1][np.diff(self.offsets) > 0]
+        return (distance_matrix[customers, self.succ[customers]].sum()
+                + distance_matrix[self.depot, self.tour[starts]].sum())
+
+    def swap(self, a, b):
+        """Exchanges customers a and b, in the same route or in different routes"""
+        pos_a, pos_b = self.position[a], self.position[b]
+        route_a, route_b = self.route_of[a], self.route_of[b]
+        self.tour[pos_a], self.tour[pos_b] = b, a
+        self.position[a], self.position[b] = pos_b, pos_a
+        self.route_of[a], self.route_of[b] = route_b, route_a
+        if self.loads is not None and route_a != route_b:
+            shift = self.node_demand[b] - self.node_demand[a]
+            self.loads[route_a] += shift
+            self.loads[route_b] -= shift
+        self._relink_range(pos_a - 1, pos_a + 2)
+        self._relink_range(pos_b - 1, pos_b + 2)
+
+    def insert_after(self, node, after, route=None):
+        """
+        Moves customer node to just after `after`. With after == depot the
+        node goes to the start of `route` (which may be empty).
+        """
+        old_pos = self.position[node]
+        old_route = self.route_of[node]
+        if after == self.depot:
+            new_route = route
+            target = self.offsets[route]  # position before the shift
+        else:
+            new_route = self.route_of[after]
+            target = self.position[after] + 1
+
+        if target > old_pos:
+            # Close the gap: (old_pos, target) moves one to the left
+            target -= 1
+            self.tour[old_pos:target] = self.tour[old_pos + 1:target + 1]
+            self.offsets[old_route + 1:new_route + 1] -= 1
+        else:
+            # Open a gap: [target, old_pos) moves one to the right
+            self.tour[target + 1:old_pos + 1] = self.tour[target:old_pos]
+            self.offsets[new_route + 1:old_route + 1] += 1
+        self.tour[target] = node
+
+        low, high = min(old_pos, target), max(old_pos, target)
+        self.position[self.tour[low:high + 1]] = np.arange(low, high + 1)
+        self.route_of[node] = new_route
+        if self.loads is not None and old_route != new_route:
+            self.loads[old_route] -= self.node_demand[node]
+            self.loads[new_route] += self.node_demand[node]
+        # Everything else moved together with its route boundaries, so only
+        # the old and new neighbourhoods of node need new links
+        self._relink_range(old_pos - 1, old_pos + 2)
+        self._relink_range(target - 1, target + 2)
+
+    def reverse(self, a, b):
+        """Reverses the stretch of a route from customer a to customer b (2-opt)"""
+        i, j = sorted((self.position[a], self.position[b]))
+        self.tour[i:j + 1] = self.tour[i:j + 1][::-1]
+        self.position[self.tour[i:j + 1]] = np.arange(i, j + 1)
+        self._relink_range(i - 1, j + 2)
@@ -0,0 +1,147 @@
+"""
+Warm start from a saved solution.
+
+Solutions are read and written in the CVRPLIB .sol format
+
+    Route #1: 21 31 19 17 13 7 26
+    Route #2: 12 1 16 30
+    Cost 784
+
+where customers are numbered 1..n-1 in file order with the depot left
+out (with the depot as node 1 of the .vrp file, customer k is our node
+k). The solver's own results are written in the same format, so a run
+can pick up from the reference solution or from an earlier run.
+
+A loaded solution is checked against the instance. If the instance has
+changed a little since (demands, new customers), repair=True makes it
+feasible again: overloaded routes shed customers from their end, and
+those plus any unvisited customers go to their cheapest feasible
+insertion point, or to a new route.
+"""
+
+import re
+
+from operators import DEFAULT_OPERATORS
+
+
+def _customer_ids(depot, num_nodes):
+    """Our node of every .sol customer number (index 0 unused)"""
+    return [None] + [node for node in range(num_nodes) if node != depot]
+
+
+def read_solution(file_path, depot, num_nodes):
+    """Routes of a .sol file, [depot, c1, ..., depot] in our node ids, and the cost line (None if missing)"""
+    nodes = _customer_ids(depot, num_nodes)
+    routes, cost = [], None
+    with open(file_path, "r") as file:
+        for line in file:
+            if line.startswith("Route"):
+                ids = [int(token) for token in line.split(":", 1)[1].split()]
+                if any(not 0 < customer < num_nodes for customer in ids):
+                    raise ValueError(f"{file_path}: customer number out of range in {line.strip()!r}")
+                routes.append([depot] + [nodes[customer] for customer in ids] + [depot])
+            elif line.startswith("Cost"):
+                cost = float(re.findall(r"[-+]?\d*\.?\d+(?:[eE][-+]?\d+)?", line)[0])
+    return routes, cost
+
+
+def write_solution(file_path, routes, cost, depot, num_nodes):
+    """Writes routes in our node ids as a .sol file; empty routes are left out"""
+    number = {node: k for k, node in enumerate(_customer_ids(depot, num_nodes)) if node is not None}
+    cost = float(cost)
+    with open(file_path, "w") as file:
+        for k, route in enumerate((route for route in routes if len(route) > 2), start=1):
+            file.write(f"Route #{k}: {' '.join(str(number[node]) for node in route[1:-1])}\n")
+        file.write(f"Cost {int(cost) if cost.is_integer() else round(cost, 2)}\n")
+
+
+def check_solution(routes, depot, customers, capacity, demands):
+    """Everything that makes routes infeasible for the instance, as messages; empty if feasible"""
+    problems = []
+    seen = set()
+    for k, route in enumerate(routes, start=1):
+        if route[0] != depot or route[-1] != depot:
+            problems.append(f"route {k} does not start and end at the depot")
+        visits = route[1:-1]
+        for node in visits:
+            if node == depot or node + 1 not in demands:
+                problems.append(f"route {k} visits unknown node {node}")
+            elif node in seen:
+                problems.append(f"customer {node} is visited more than once")
+            seen.add(node)
+        load = sum(demands.get(node + 1, 0) for node in visits)
+        if load > capacity:
+            problems.append(f"route {k} carries {load} > capacity {capacity}")
+    missing = set(customers) - seen
+    if missing:
+        problems.append(f"{len(missing)} customers are not visited, e.g. {min(missing)}")
+    return problems
+
+
+def repair_solution(routes, depot, customers, capacity, demands, distance_matrix):
+    """
+    Feasible routes close to the given ones: unknown and repeated visits are
+    dropped, overloaded routes are unloaded from the end, and the customers
+    left over are inserted where they add the least distance.
+    """
+    customer_set = set(customers)
+    seen = set()
+    repaired, loads, unassigned = [], [], []
+    for route in routes:
+        visits = []
+        for node in route:
+            if node in customer_set and node not in seen:
+                seen.add(node)
+                visits.append(node)
+        load = sum(demands[node + 1] for node in visits)
+        while load > capacity:
+            node = visits.pop()
+            load -= demands[node + 1]
+            unassigned.append(node)
+        repaired.append([depot] + visits + [depot])
+        loads.append(load)
+    unassigned += [node for node in customers if node not in seen]
+
+    dm = distance_matrix
+    for node in sorted(unassigned, key=lambda node: -demands[node + 1]):
+        demand = demands[node + 1]
+        best = None
+        for r, route in enumerate(repaired):
+            if loads[r] + demand > capacity:
+                continue
+            for i in range(len(route) - 1):
+                increase = dm[route[i], node] + dm[node, route[i + 1]] - dm[route[i], route[i + 1]]
+                if best is None or increase < best[0]:
+                    best = (increase, r, i + 1)
+        if best is None:
+            repaired.append([depot, node, depot])
+            loads.append(demand)
+        else:
+            _, r, i = best
+            repaired[r].insert(i, node)
+            loads[r] += demand
+    return [route for route in repaired if len(route) > 2]
+
+
+def warm_start(solution_path, depot, customers, capacity, demands, distance_matrix, temp_initial=None,
+               repair=False, **solve_options):
+    """
+    Continues annealing (solver.solve) from the solution in solution_path,
+    starting at temp_initial (estimated from sampled moves when None).
+    Raises ValueError for an infeasible solution unless repair=True, which
+    prints the problems and repairs it.
+    solve_options go to solver.solve (time_limit, max_evaluations, ...).
+    Returns the solve() result dict.
+    """
+    from solver import solve
+
+    routes, _ = read_solution(solution_path, depot, len(distance_matrix))
+    problems = check_solution(routes, depot, customers, capacity, demands)
+    if problems:
+        if not repair:
+            raise ValueError(f"{solution_path} is not feasible for this instance: " + "; ".join(problems))
+        print(f"repairing {solution_path}: " + "; ".join(problems))
+        routes = repair_solution(routes, depot, customers, capacity, demands, distance_matrix)
+    solve_options.setdefault("operators", DEFAULT_OPERATORS)
+    return solve(depot, customers, capacity, demands, distance_matrix, len(routes), temp_initial=temp_initial,
+                 initial_routes=routes, **solve_options)
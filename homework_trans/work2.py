@@ -1,18 +1,19 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+import argparse
 import os
 from workM import run_app
 
 problem_instances = []
-# 设置字体
-plt.rcParams['font.family'] = 'SimHei'
-# 解决负号显示问题
-plt.rcParams['axes.unicode_minus'] = False
 
 def analyze_vrp_results(problem_instances):
+    # Plotting libraries are only needed here, not by the solver
+    import pandas as pd
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    # 设置字体
+    plt.rcParams['font.family'] = 'SimHei'
+    # 解决负号显示问题
+    plt.rcParams['axes.unicode_minus'] = False
 
-    
     df = pd.DataFrame(problem_instances, columns=["Problem Type", "Num Nodes", "Solution Quality", "Solve Time"])
     
     corr_matrix = df[["Num Nodes", "Solution Quality", "Solve Time"]].corr()
@@ -61,7 +62,10 @@ def process_vrp_files(root_folder):
 
 
 # **运行代码**
-root_folder = r"homework_trans"
-process_vrp_files(root_folder)
-df_results = analyze_vrp_results(problem_instances)
-print(df_results)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve every A/M/P instance and plot the results")
+    parser.add_argument("root_folder", nargs="?", default="homework_trans", help="folder containing A/, M/ and P/")
+    args = parser.parse_args()
+    process_vrp_files(args.root_folder)
+    df_results = analyze_vrp_results(problem_instances)
+    print(df_results)
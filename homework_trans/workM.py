@@ -5,40 +5,88 @@ import re
 import time
 
 
-def load_vrp_data(file_path):
+def parse_vrp(file_path):
+    """
+    Reads a TSPLIB/CVRPLIB instance in one pass over the file.
+    Coordinates may be floats. Node ids are 1-based in the file and
+    0-based in the returned arrays.
+    """
+    header = {}
+    sections = {}
+    section = None
     with open(file_path, "r") as file:
-        vrp_data = [line.strip() for line in file.readlines()]
-
-    node_coord_start = vrp_data.index("NODE_COORD_SECTION") + 1
-    demand_start = vrp_data.index("DEMAND_SECTION") + 1
-    depot_start = vrp_data.index("DEPOT_SECTION") + 1
-    capacity_line = [line for line in vrp_data if "CAPACITY" in line][0]
-    
-    node_coords = {}
-    for line in vrp_data[node_coord_start:demand_start - 1]:
-        parts = list(map(int, re.findall(r'\d+', line)))
-        node_coords[parts[0]] = (parts[1], parts[2])
-
-    demands = {}
-    for line in vrp_data[demand_start:depot_start - 1]:
-        parts = list(map(int, re.findall(r'\d+', line)))
-        demands[parts[0]] = parts[1]
-
-    depot_id = int(re.findall(r'\d+', vrp_data[depot_start])[0])
-    capacity = int(re.findall(r'\d+', capacity_line)[0])
-
-    num_nodes = len(node_coords)
-    # print(node_coords)
-    distance_matrix = np.zeros((num_nodes, num_nodes))
-    for i in range(1, num_nodes + 1):
-        for j in range(1, num_nodes + 1):
-            x1, y1 = node_coords[i]
-            x2, y2 = node_coords[j]
-            distance_matrix[i-1, j-1] = np.sqrt((x1 - x2) ** 2 + (y1 - y2) ** 2)
-
-    # print(distance_matrix)
-
-    return depot_id - 1, list(range(1, num_nodes)), capacity, demands, distance_matrix
+        for line in file:
+            line = line.strip()
+            if not line or line == "EOF":
+                continue
+            if line.endswith("_SECTION"):
+                section = line
+                sections[section] = []
+            elif section is None or (":" in line and line.split(":", 1)[0].strip().isupper()):
+                key, _, value = line.partition(":")
+                header[key.strip()] = value.strip()
+                section = None
+            else:
+                sections[section].append(line)
+
+    def section_array(name, columns):
+        values = np.array(" ".join(sections[name]).split(), dtype=np.float64)
+        return values.reshape(-1, columns)
+
+    node_coords = section_array("NODE_COORD_SECTION", 3)
+    order = np.argsort(node_coords[:, 0], kind="stable")
+    coords = node_coords[order, 1:]
+
+    demand_rows = section_array("DEMAND_SECTION", 2)
+    demands = np.zeros(len(coords), dtype=np.int64)
+    demands[demand_rows[:, 0].astype(np.int64) - 1] = demand_rows[:, 1]
+
+    depot_ids = [int(token) for token in " ".join(sections.get("DEPOT_SECTION", ["1"])).split()]
+    depot_ids = [node for node in depot_ids if node != -1]
+
+    capacity_key = [key for key in header if "CAPACITY" in key][0]
+    return {
+        "name": header.get("NAME", ""),
+        "edge_weight_type": header.get("EDGE_WEIGHT_TYPE", "EUC_2D"),
+        "capacity": int(float(header[capacity_key])),
+        "depot": depot_ids[0] - 1,
+        "coords": coords,
+        "demands": demands,
+    }
+
+
+def build_distance_matrix(coords, dtype=np.float64, rounding=False, chunk_size=1024):
+    """
+    Euclidean distance matrix built with broadcasting, a block of rows
+    at a time so the temporaries stay small on big instances.
+    rounding=True applies the TSPLIB EUC_2D convention nint(d) = floor(d + 0.5),
+    which is what the CVRPLIB .sol costs are computed with.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind in "iu" and not rounding:
+        raise ValueError("Integer distance matrices need rounding=True")
+
+    x, y = coords[:, 0], coords[:, 1]
+    num_nodes = len(coords)
+    distance_matrix = np.empty((num_nodes, num_nodes), dtype=dtype)
+    for start in range(0, num_nodes, chunk_size):
+        stop = min(start + chunk_size, num_nodes)
+        dx = x[start:stop, None] - x[None, :]
+        dy = y[start:stop, None] - y[None, :]
+        block = np.sqrt(dx * dx + dy * dy)
+        if rounding:
+            block = np.floor(block + 0.5)
+        distance_matrix[start:stop] = block
+    return distance_matrix
+
+
+def load_vrp_data(file_path, dtype=np.float64, rounding=False):
+    instance = parse_vrp(file_path)
+    num_nodes = len(instance["coords"])
+    demands = dict(zip(range(1, num_nodes + 1), instance["demands"].tolist()))
+    distance_matrix = build_distance_matrix(instance["coords"], dtype=dtype, rounding=rounding)
+
+    return instance["depot"], list(range(1, num_nodes)), instance["capacity"], demands, distance_matrix
 
 
 def load_optimal_solution(file_path):
@@ -56,6 +104,11 @@ cooling_rate = 0.995  # 冷却率
 max_iterations = 500  # 每个温度的迭代次数
 
 
+# Deltas this close to zero are usually cost-neutral moves (e.g. reversing a
+# two-customer route) whose sign depends on summation order.
+TIE_TOLERANCE = 1e-6
+
+
 def total_distance(route, distance_matrix):
     
     distance = 0
@@ -64,72 +117,87 @@ def total_distance(route, distance_matrix):
     return distance
 
 
+def solution_cost(solution, distance_matrix):
+    return sum(total_distance(route, distance_matrix) for route in solution)
+
+
 def savings(depot, i, j, distance_matrix):
     return distance_matrix[depot][i] + distance_matrix[depot][j] - distance_matrix[i][j]
 
+def savings_order(depot, customers, distance_matrix):
+    """
+    All (i, j) customer pairs ordered by savings, largest first, ties broken
+    by larger i then larger j (the order of sorting (s, i, j) tuples in reverse).
+    """
+    nodes = np.asarray(customers)
+    to_depot = distance_matrix[depot, nodes]
+    savings_matrix = to_depot[:, None] + to_depot[None, :] - distance_matrix[np.ix_(nodes, nodes)]
+
+    i_idx, j_idx = np.nonzero(~np.eye(len(nodes), dtype=bool))
+    values = savings_matrix[i_idx, j_idx]
+    i_nodes, j_nodes = nodes[i_idx], nodes[j_idx]
+    order = np.lexsort((-j_nodes, -i_nodes, -values))
+    return i_nodes[order].tolist(), j_nodes[order].tolist()
+
+
 def initial_solution(depot, customers, capacity, demands, distance_matrix, max_vehicles):
-    # Initialize a separate car for each customer
-    routes = [[depot, customer, depot] for customer in customers]
-
-    # Calculate the savings between all pairs of nodes
-    savings_list = []
-    for i in customers:
-        for j in customers:
-            if i != j:
-                s = savings(depot, i, j, distance_matrix)
-                savings_list.append((s, i, j))
-    # Sort by savings from largest to smallest
-    savings_list.sort(reverse=True)
-
-    # Try merging node pairs in turn
-    for s, i, j in savings_list:
-        route_i = None
-        route_j = None
-        for route in routes:
-            if i in route and route.index(i) != 0 and route.index(i) != len(route) - 1:
-                route_i = route
-            if j in route and route.index(j) != 0 and route.index(j) != len(route) - 1:
-                route_j = route
-        if route_i and route_j and route_i != route_j:
-            load_i = sum(demands[node + 1] for node in route_i if node != depot)
-            load_j = sum(demands[node + 1] for node in route_j if node != depot)
-            if load_i + load_j <= capacity:
-                if route_i[-2] == i and route_j[1] == j:
-                    new_route = route_i[:-1] + route_j[1:]
-                    routes.remove(route_i)
-                    routes.remove(route_j)
-                    routes.append(new_route)
+    if not customers:
+        return []
+    # Initialize a separate car for each customer. Routes are kept in a dict
+    # whose insertion order is the order of the route list: a merged route
+    # is re-inserted at the end, like remove() + append() on a list.
+    routes = {customer: [depot, customer, depot] for customer in customers}
+    loads = {customer: demands[customer + 1] for customer in customers}
+    route_of = {customer: customer for customer in customers}
+
+    # Try merging node pairs in turn, largest savings first. A pair merges
+    # when i ends one route and j starts another.
+    for i, j in zip(*savings_order(depot, customers, distance_matrix)):
+        route_i, route_j = route_of[i], route_of[j]
+        if route_i == route_j or loads[route_i] + loads[route_j] > capacity:
+            continue
+        if routes[route_i][-2] == i and routes[route_j][1] == j:
+            tail = routes.pop(route_j)
+            routes[route_i] = routes.pop(route_i)[:-1] + tail[1:]
+            loads[route_i] += loads.pop(route_j)
+            for node in tail[1:-1]:
+                route_of[node] = route_i
+
+    loads = [loads[key] for key in routes]
+    routes = list(routes.values())
 
     # **Added logic: Limit the maximum number of vehicles**
     while len(routes) > max_vehicles:
-        # Find the two shortest routes that can be combined
+        # Merge the feasible pair (r1 < r2, r1 then r2) that adds the least distance
+        heads = np.array([route[1] for route in routes])
+        tails = np.array([route[-2] for route in routes])
+        load_array = np.array(loads)
+        increase = (distance_matrix[tails[:, None], heads[None, :]]
+                    - distance_matrix[tails, depot][:, None] - distance_matrix[depot, heads][None, :])
+        feasible = np.triu(load_array[:, None] + load_array[None, :] <= capacity, k=1)
+        if not feasible.any():
+            break  # Unable to continue merge
+        increase = np.where(feasible, increase, np.inf)
+
+        # Candidates within rounding noise of the minimum are compared on
+        # full route lengths, in loop order, as the pairwise scan did.
         best_merge = None
         best_distance_increase = float('inf')
-        
-        for r1 in range(len(routes)):
-            for r2 in range(r1 + 1, len(routes)):
-                # Check if it is overloaded after merging
-                load_r1 = sum(demands[node + 1] for node in routes[r1] if node != depot)
-                load_r2 = sum(demands[node + 1] for node in routes[r2] if node != depot)
-                
-                if load_r1 + load_r2 <= capacity:
-                    # Calculate the distance change before and after the merge
-                    old_distance = total_distance(routes[r1], distance_matrix) + total_distance(routes[r2], distance_matrix)
-                    new_route = routes[r1][:-1] + routes[r2][1:]
-                    new_distance = total_distance(new_route, distance_matrix)
-
-                    distance_increase = new_distance - old_distance
-                    if distance_increase < best_distance_increase:
-                        best_distance_increase = distance_increase
-                        best_merge = (r1, r2, new_route)
-        
-        if best_merge:
-            r1, r2, new_route = best_merge
-            routes.pop(max(r1, r2))  # Remove the larger index first to avoid misalignment
-            routes.pop(min(r1, r2))
-            routes.append(new_route)
-        else:
-            break  # Unable to continue merge
+        for r1, r2 in zip(*np.nonzero(increase <= increase.min() + TIE_TOLERANCE)):
+            old_distance = total_distance(routes[r1], distance_matrix) + total_distance(routes[r2], distance_matrix)
+            new_route = routes[r1][:-1] + routes[r2][1:]
+            distance_increase = total_distance(new_route, distance_matrix) - old_distance
+            if distance_increase < best_distance_increase:
+                best_distance_increase = distance_increase
+                best_merge = (r1, r2, new_route)
+
+        r1, r2, new_route = best_merge
+        merged_load = loads[r1] + loads[r2]
+        for idx in (max(r1, r2), min(r1, r2)):  # Remove the larger index first to avoid misalignment
+            routes.pop(idx)
+            loads.pop(idx)
+        routes.append(new_route)
+        loads.append(merged_load)
 
     return routes
 
@@ -143,40 +211,279 @@ def swap(solution):
     return new_solution
 
 
-def simulated_annealing(depot, customers, capacity, demands, distance_matrix, max_vehicles):
-    current_solution = initial_solution(depot, customers, capacity, demands, distance_matrix, max_vehicles)
-    current_cost = sum(total_distance(route, distance_matrix) for route in current_solution)
-    best_solution, best_cost = current_solution, current_cost
+def swap_delta(route, i, j, distance_matrix):
+    """Cost change of swapping positions i and j of a route, from the (at most) four edges it touches"""
+    if i > j:
+        i, j = j, i
+    a, b = route[i], route[j]
+    prev_i, next_j = route[i - 1], route[j + 1]
+    if j == i + 1:
+        old = distance_matrix[prev_i, a] + distance_matrix[a, b] + distance_matrix[b, next_j]
+        new = distance_matrix[prev_i, b] + distance_matrix[b, a] + distance_matrix[a, next_j]
+    else:
+        next_i, prev_j = route[i + 1], route[j - 1]
+        old = (distance_matrix[prev_i, a] + distance_matrix[a, next_i]
+               + distance_matrix[prev_j, b] + distance_matrix[b, next_j])
+        new = (distance_matrix[prev_i, b] + distance_matrix[b, next_i]
+               + distance_matrix[prev_j, a] + distance_matrix[a, next_j])
+    return new - old
+
+
+def _exact_swap_delta(routes, route_idx, i, j, distance_matrix):
+    """Delta from full-solution sums, so near-ties are decided like the original full recomputation"""
+    route = routes[route_idx]
+    old_cost = solution_cost(routes, distance_matrix)
+    route[i], route[j] = route[j], route[i]
+    new_cost = solution_cost(routes, distance_matrix)
+    route[i], route[j] = route[j], route[i]
+    return new_cost - old_cost
+
+
+class RouteState:
+    """Routes of a solution with cached per-route cost and load, updated in place by accepted moves"""
+
+    def __init__(self, routes, depot, demands, distance_matrix, capacity=None):
+        self.routes = [route[:] for route in routes]
+        self.depot = depot
+        self.capacity = capacity
+        self.distance_matrix = distance_matrix
+        self.node_demand = [demands.get(node + 1, 0) for node in range(len(distance_matrix))]
+        self.node_demand[depot] = 0
+        self.costs = [total_distance(route, distance_matrix) for route in self.routes]
+        self.loads = [sum(self.node_demand[node] for node in route) for route in self.routes]
+        # node -> (route index, position in route) for O(1) lookups
+        self.route_of = [-1] * len(distance_matrix)
+        self.position = [0] * len(distance_matrix)
+        for route_idx in range(len(self.routes)):
+            self.reindex(route_idx)
+
+    def reindex(self, route_idx):
+        route = self.routes[route_idx]
+        for pos in range(1, len(route) - 1):
+            self.route_of[route[pos]] = route_idx
+            self.position[route[pos]] = pos
+
+    def update_route(self, route_idx):
+        """Refreshes the caches of a route after its node list was changed"""
+        route = self.routes[route_idx]
+        self.costs[route_idx] = total_distance(route, self.distance_matrix)
+        self.loads[route_idx] = sum(self.node_demand[node] for node in route)
+        self.reindex(route_idx)
+
+    def snapshot(self):
+        return [route[:] for route in self.routes]
+
+    def apply_swap(self, route_idx, i, j, delta):
+        route = self.routes[route_idx]
+        route[i], route[j] = route[j], route[i]
+        self.position[route[i]], self.position[route[j]] = i, j
+        self.costs[route_idx] += delta
+
+
+def simulated_annealing(depot, customers, capacity, demands, distance_matrix, max_vehicles, operators=None, rng=random,
+                        neighbors=None, batch_size=None, stats=None, polish_interval=None):
+    """
+    operators=None runs the original single-route swap neighborhood.
+    A list of names from operators.OPERATORS (e.g. operators.DEFAULT_OPERATORS)
+    switches to the capacity-aware inter/intra-route moves, chosen adaptively.
+    rng is the source of random draws, e.g. random.Random(seed) for an independent chain.
+    neighbors (operators.nearest_neighbors) makes the operator moves granular.
+    batch_size switches to batch.anneal_batched, which samples and scores that
+    many swap/relocate moves at once with NumPy (see batch.py for the acceptance rules).
+    stats (instrumentation.SolverStats) collects per-step rates and the
+    construction/search time split; None keeps the loops free of it.
+    polish_interval re-orders the routes (polish.RoutePolisher) every that
+    many steps and polishes the result; it needs operators and no batch_size.
+    """
+    if polish_interval is not None and (operators is None or batch_size is not None):
+        raise ValueError("polish_interval needs operators and cannot be combined with batch_size")
+    construction_start = time.perf_counter()
+    routes = initial_solution(depot, customers, capacity, demands, distance_matrix, max_vehicles)
+    if stats is not None:
+        stats.add_time("construction", time.perf_counter() - construction_start)
+
+    if batch_size is not None:
+        from batch import anneal_batched
+        from tour import GiantTour
+        tour = GiantTour.from_routes(routes, depot, len(distance_matrix), demands)
+        best_solution, best_cost = anneal_batched(tour, distance_matrix, capacity, temp_initial, temp_final,
+                                                  cooling_rate, max_iterations, batch_size,
+                                                  np.random.default_rng(rng.getrandbits(64)), neighbors, stats)
+        return best_solution, best_cost
+
+    search_start = time.perf_counter()
+    state = RouteState(routes, depot, demands, distance_matrix, capacity)
+    if operators is not None:
+        from operators import anneal
+        result = anneal(state, temp_initial, temp_final, cooling_rate, max_iterations, operators, rng, neighbors,
+                        stats, polish_interval)
+        if stats is not None:
+            stats.add_time("search", time.perf_counter() - search_start)
+        return result
+
+    routes = state.routes
+    current_cost = solution_cost(routes, distance_matrix)
+    best_solution, best_cost = None, current_cost
+    # The best solution is only copied when the search moves away from it,
+    # not on every improvement.
+    current_is_best = True
     temp = temp_initial
 
     while temp > temp_final:
+        accepted = improving = 0
         for _ in range(max_iterations):
-            new_solution = swap(current_solution)
-            new_cost = sum(total_distance(route, distance_matrix) for route in new_solution)
-
-            if new_cost < current_cost or math.exp((current_cost - new_cost) / temp) > random.random():
-                current_solution, current_cost = new_solution, new_cost
-                if new_cost < best_cost:
-                    best_solution, best_cost = new_solution, new_cost
+            # Same proposal and random draws as swap(), scored by its delta only
+            route_idx = rng.randint(0, len(routes) - 1)
+            route = routes[route_idx]
+            if len(route) > 3:
+                i, j = rng.sample(range(1, len(route) - 1), 2)
+                delta = swap_delta(route, i, j, distance_matrix)
+                if abs(delta) < TIE_TOLERANCE:
+                    delta = _exact_swap_delta(routes, route_idx, i, j, distance_matrix)
+            else:
+                i = None
+                delta = 0
+
+            if delta < 0 or math.exp(-delta / temp) > rng.random():
+                if i is None:
+                    continue
+                accepted += 1
+                if current_is_best:
+                    improves = delta < 0
+                    if not improves:
+                        best_solution = state.snapshot()
+                        current_is_best = False
+                    state.apply_swap(route_idx, i, j, delta)
+                    current_cost += delta
+                else:
+                    state.apply_swap(route_idx, i, j, delta)
+                    current_cost += delta
+                    if abs(current_cost - best_cost) < TIE_TOLERANCE:
+                        current_cost = solution_cost(routes, distance_matrix)
+                    improves = current_cost < best_cost
+                if improves:
+                    # Keep the best cost exact, near-ties against it are decided on full sums
+                    current_cost = best_cost = solution_cost(routes, distance_matrix)
+                    current_is_best = True
+                if delta < 0:
+                    improving += 1
+        if stats is not None:
+            stats.record_step(temp, current_cost, best_cost, ("swap",), (max_iterations,), (accepted,), (improving,))
         temp *= cooling_rate
 
+    if current_is_best:
+        best_solution = state.snapshot()
+    # Recompute from scratch so rounding drift of the running sum does not leak out
+    best_cost = solution_cost(best_solution, distance_matrix)
+    if stats is not None:
+        stats.add_time("search", time.perf_counter() - search_start)
     return best_solution, best_cost
 
 
-def run_app(file_path, optimal_solution_path):
+def run_app(file_path, optimal_solution_path, cache_dir=None, operators=None, granularity=None, time_limit=None,
+            stats_path=None, decomposition=None, initial_solution_path=None, warm_temperature=None,
+            solution_output=None, polish_interval=None, batch_size=None, chains=None, mode="independent",
+            repair=False):
 
     start_time = time.time()
+    stats = None
+    if stats_path is not None:
+        # Solver statistics, written to stats_path as JSON at the end
+        from instrumentation import SolverStats
+        stats = SolverStats()
 
     # print(file_path)
 
     match = re.search(r'k(\d+)', file_path)
     if match:
         max_vehicles = int(match.group(1))  # 获取匹配到的数字并转换为整数
-    depot, customers, capacity, demands, distance_matrix = load_vrp_data(file_path)
-    # print( depot, customers, capacity, demands, distance_matrix )
-    best_routes, best_distance = simulated_annealing(depot, customers, capacity, demands, distance_matrix, max_vehicles)
-    optimal_cost = load_optimal_solution(optimal_solution_path)
-    deviation = abs(best_distance - optimal_cost) / optimal_cost * 100
+    if initial_solution_path is None and (warm_temperature is not None or repair):
+        raise ValueError("warm_temperature and repair need initial_solution_path")
+    if decomposition is not None:
+        # Very large instances: clusters are solved separately, without a full distance matrix
+        from decompose import decompose_solve
+        from operators import DEFAULT_OPERATORS
+        unsupported = {"cache_dir": cache_dir, "granularity": granularity, "stats_path": stats_path,
+                       "initial_solution_path": initial_solution_path, "warm_temperature": warm_temperature,
+                       "polish_interval": polish_interval, "batch_size": batch_size, "chains": chains}
+        unsupported = [name for name, value in unsupported.items() if value is not None]
+        if unsupported:
+            raise ValueError(f"decomposition does not support {', '.join(unsupported)}")
+        instance = parse_vrp(file_path)
+        depot, demands = instance["depot"], instance["demands"]
+        best_routes, best_distance = decompose_solve(instance["coords"], demands, instance["capacity"],
+                                                     instance["depot"], method=decomposition,
+                                                     operators=operators or DEFAULT_OPERATORS, total_time=time_limit,
+                                                     seed=random.getrandbits(32))
+    else:
+        # batch_size is only used by the fixed schedule, chains by parallel.parallel_annealing
+        if batch_size is not None and (time_limit is not None or initial_solution_path is not None
+                                       or chains is not None):
+            raise ValueError("batch_size cannot be combined with time_limit, initial_solution_path or chains")
+        if chains is not None:
+            unsupported = {"granularity": granularity, "stats_path": stats_path,
+                           "initial_solution_path": initial_solution_path, "polish_interval": polish_interval}
+            unsupported = [name for name, value in unsupported.items() if value is not None]
+            if unsupported:
+                raise ValueError(f"chains does not support {', '.join(unsupported)}")
+        if cache_dir is None:
+            depot, customers, capacity, demands, distance_matrix = load_vrp_data(file_path)
+        else:
+            from instance_cache import load_vrp_data_cached
+            depot, customers, capacity, demands, distance_matrix = load_vrp_data_cached(file_path, cache_dir)
+        if stats is not None:
+            stats.add_time("load", time.time() - start_time)
+        # print( depot, customers, capacity, demands, distance_matrix )
+        neighbors = None
+        if granularity:
+            # Granular moves: partners come from each customer's `granularity` nearest neighbours
+            from operators import nearest_neighbors, DEFAULT_OPERATORS
+            if cache_dir is None:
+                coords = parse_vrp(file_path)["coords"]
+            else:
+                from instance_cache import load_cached_instance
+                coords = load_cached_instance(file_path, cache_dir)["coords"]
+            neighbors = nearest_neighbors(coords, granularity, depot)
+            operators = operators or DEFAULT_OPERATORS
+        if chains is not None:
+            # Several annealing chains on a process pool
+            from parallel import parallel_annealing
+            from operators import DEFAULT_OPERATORS
+            best_routes, best_distance, _ = parallel_annealing(depot, customers, capacity, demands, distance_matrix,
+                                                               max_vehicles, chains=chains, mode=mode,
+                                                               operators=operators or DEFAULT_OPERATORS,
+                                                               time_limit=time_limit, seed=random.getrandbits(32))
+        elif initial_solution_path is not None:
+            # Warm start: keep annealing from a saved .sol solution; with repair=True an infeasible
+            # one (e.g. the instance changed since) is made feasible instead of raising ValueError
+            from warm_start import warm_start
+            from operators import DEFAULT_OPERATORS
+            result = warm_start(initial_solution_path, depot, customers, capacity, demands, distance_matrix,
+                                temp_initial=warm_temperature, repair=repair, time_limit=time_limit,
+                                operators=operators or DEFAULT_OPERATORS, neighbors=neighbors, stats=stats,
+                                polish_interval=polish_interval)
+            best_routes, best_distance = result["routes"], result["cost"]
+        elif time_limit is not None:
+            # Anytime mode: the schedule is derived from the time budget
+            from solver import solve
+            from operators import DEFAULT_OPERATORS
+            result = solve(depot, customers, capacity, demands, distance_matrix, max_vehicles, time_limit=time_limit,
+                           operators=operators or DEFAULT_OPERATORS, neighbors=neighbors, stats=stats,
+                           polish_interval=polish_interval)
+            best_routes, best_distance = result["routes"], result["cost"]
+        else:
+            best_routes, best_distance = simulated_annealing(depot, customers, capacity, demands, distance_matrix,
+                                                             max_vehicles, operators, neighbors=neighbors,
+                                                             batch_size=batch_size, stats=stats,
+                                                             polish_interval=polish_interval)
+    # Without a reference solution there is no deviation to report
+    optimal_cost = deviation = None
+    if optimal_solution_path is not None:
+        optimal_cost = load_optimal_solution(optimal_solution_path)
+        deviation = abs(best_distance - optimal_cost) / optimal_cost * 100
+    if solution_output is not None:
+        from warm_start import write_solution
+        write_solution(solution_output, best_routes, best_distance, depot, len(demands))
         
 
     for route in best_routes:
@@ -184,9 +491,12 @@ def run_app(file_path, optimal_solution_path):
             route[i] += 1
 
     solve_time = time.time() - start_time
+    if stats is not None:
+        stats.to_json(stats_path)
     print(len(best_routes))
     print("best_routes:", best_routes)
     print("best_distance:", best_distance)
-    print("optimal_cost:", optimal_cost)
-    print(f"deviation: {deviation:.2f}%")
+    if optimal_cost is not None:
+        print("optimal_cost:", optimal_cost)
+        print(f"deviation: {deviation:.2f}%")
     return deviation,solve_time,len(demands)